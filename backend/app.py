@@ -14,14 +14,55 @@ Author: Mohan Yang
 Repository: https://github.com/HenryYang03/AutoExtract.git
 """
 
-from flask import Flask, abort, jsonify, send_from_directory
+# config first: it caps native thread pools before numpy/cv2 are imported
+from config import UPLOAD_DIR, SECRET_KEY, HOST, PORT, DEBUG, MAX_UPLOAD_BYTES
+from flask import Blueprint, Flask, Request, abort, jsonify, send_from_directory
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import HTTPException
+import io
 import os
 
-from config import UPLOAD_DIR, SECRET_KEY, HOST, PORT, DEBUG
+try:
+    import orjson
+except ImportError:  # optional: fall back to Flask's stdlib json provider
+    orjson = None
+
+from file_utils import clear_upload_folder
 from model_manager import model_manager
 from routes import handle_bar_analyzer, handle_update_values, handle_update_box_coordinates, handle_uploaded_file, handle_calculate_heights, handle_update_bar_names, handle_update_box_category, handle_add_new_box, handle_remove_box
 
 
+class InMemoryUploadRequest(Request):
+    """
+    Request that parses uploaded files into memory instead of a temp file.
+    
+    Werkzeug spools file parts over 500 KB to a temporary file, which the
+    analyzer then reads back; uploads are bounded by MAX_CONTENT_LENGTH, so
+    they can go straight from the socket into the buffer that is decoded.
+    """
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson for request parsing and response bodies.
+    
+    Detection lists are floats-heavy and serialized on every editing call;
+    orjson encodes them several times faster than the stdlib and handles
+    NumPy scalars/arrays natively. Anything else falls back to Flask's
+    default conversions (dates, dataclasses, ...).
+    """
+    
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 def create_app() -> Flask:
     """
     Create and configure the Flask application.
@@ -42,9 +83,13 @@ def create_app() -> Flask:
     # Configure app
     app.secret_key = SECRET_KEY
     app.config['UPLOAD_FOLDER'] = UPLOAD_DIR
+    app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+    app.request_class = InMemoryUploadRequest
+    if orjson is not None:
+        app.json = ORJSONProvider(app)
     
-    # Ensure upload directory exists
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    # Start with an empty upload directory: sessions from a previous run are gone
+    clear_upload_folder(UPLOAD_DIR)
     
     # Register routes
     register_routes(app)
@@ -94,74 +139,40 @@ def register_frontend_spa(app: Flask) -> None:
         return send_from_directory(dist_dir, "index.html")
 
 
+# POST endpoints served under /api: (rule, endpoint, handler)
+API_ROUTES = [
+    ('/bar_analyzer', 'bar_analyzer', handle_bar_analyzer),
+    ('/update_values', 'update_values', handle_update_values),
+    ('/update_box_coordinates', 'update_box_coordinates', handle_update_box_coordinates),
+    ('/calculate_heights', 'calculate_heights', handle_calculate_heights),
+    ('/update_bar_names', 'update_bar_names', handle_update_bar_names),
+    ('/update_box_category', 'update_box_category', handle_update_box_category),
+    ('/add_new_box', 'add_new_box', handle_add_new_box),
+    ('/remove_box', 'remove_box', handle_remove_box),
+]
+
+
 def register_routes(app: Flask) -> None:
     """
     Register all API routes with the Flask application.
     
+    The API endpoints are collected on one blueprint from API_ROUTES and
+    added to the app's URL map in a single registration.
+    
     Args:
         app (Flask): Flask application instance to register routes with
         
     Routes:
         POST /api/bar_analyzer: Process uploaded images for graph analysis
         POST /api/update_values: Update origin and ymax values
+        POST /api/...: Box/category/name editing endpoints (see API_ROUTES)
         GET /static/uploads/<filename>: Serve uploaded files
     """
     # API routes
-    app.add_url_rule(
-        '/api/bar_analyzer',
-        'bar_analyzer',
-        handle_bar_analyzer,
-        methods=['POST']
-    )
-    
-    app.add_url_rule(
-        '/api/update_values',
-        'update_values',
-        handle_update_values,
-        methods=['POST']
-    )
-    
-    app.add_url_rule(
-        '/api/update_box_coordinates',
-        'update_box_coordinates',
-        handle_update_box_coordinates,
-        methods=['POST']
-    )
-    
-    app.add_url_rule(
-        '/api/calculate_heights',
-        'calculate_heights',
-        handle_calculate_heights,
-        methods=['POST']
-    )
-    
-    app.add_url_rule(
-        '/api/update_bar_names',
-        'update_bar_names',
-        handle_update_bar_names,
-        methods=['POST']
-    )
-    
-    app.add_url_rule(
-        '/api/update_box_category',
-        'update_box_category',
-        handle_update_box_category,
-        methods=['POST']
-    )
-    
-    app.add_url_rule(
-        '/api/add_new_box',
-        'add_new_box',
-        handle_add_new_box,
-        methods=['POST']
-    )
-    
-    app.add_url_rule(
-        '/api/remove_box',
-        'remove_box',
-        handle_remove_box,
-        methods=['POST']
-    )
+    api = Blueprint('api', __name__, url_prefix='/api')
+    for rule, endpoint, handler in API_ROUTES:
+        api.add_url_rule(rule, endpoint, handler, methods=['POST'])
+    app.register_blueprint(api)
     
     # File serving route
     app.add_url_rule(
@@ -175,6 +186,12 @@ def register_error_handlers(app: Flask) -> None:
     """
     Register error handlers for the Flask application.
     
+    Flask dispatches to the most specific handler for an exception's class,
+    so ValueError (-> 400) and RuntimeError (-> 500 with its reason, e.g. the
+    model failed to initialize) are handled before the catch-all Exception
+    handler, which also passes HTTP errors such as 405 through with their own
+    status. Route handlers let these propagate rather than catching them.
+    
     Args:
         app (Flask): Flask application instance to register error handlers with
     """
@@ -184,14 +201,34 @@ def register_error_handlers(app: Flask) -> None:
         """Handle 404 Not Found errors."""
         return jsonify({'error': 'Resource not found'}), 404
     
+    @app.errorhandler(413)
+    def request_too_large(error):
+        """Handle uploads larger than MAX_CONTENT_LENGTH."""
+        limit_mb = MAX_UPLOAD_BYTES // (1024 * 1024)
+        return jsonify({'error': f'File too large. Maximum upload size is {limit_mb} MB'}), 413
+    
     @app.errorhandler(500)
     def internal_error(error):
         """Handle 500 Internal Server errors."""
         return jsonify({'error': 'Internal server error'}), 500
     
+    @app.errorhandler(ValueError)
+    def bad_input(error):
+        """Handle invalid input surfaced by the analyzer as ValueError."""
+        return jsonify({'error': str(error)}), 400
+    
+    @app.errorhandler(RuntimeError)
+    def runtime_error(error):
+        """Handle RuntimeError (e.g. analyzer not initialized), keeping its reason."""
+        app.logger.exception("Runtime error")
+        return jsonify({'error': f'Internal server error: {error}'}), 500
+    
     @app.errorhandler(Exception)
     def handle_exception(error):
-        """Handle unhandled exceptions."""
+        """Handle unhandled exceptions, logging the traceback to stderr."""
+        if isinstance(error, HTTPException):
+            return jsonify({'error': error.description}), error.code
+        app.logger.exception("Unhandled exception")
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
 
@@ -210,6 +247,8 @@ def main():
         print("The application may not function properly.")
     else:
         print("✓ BarGraphAnalyzer model initialized successfully")
+        model_manager.warmup()
+        model_manager.start_keepalive()
     
     # Start the server
     print(f"Starting AutoExtract backend server on {HOST}:{PORT}")
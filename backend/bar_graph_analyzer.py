@@ -1,11 +1,83 @@
 from __future__ import annotations
 
-import cv2
+import functools
+import logging
+import os
+import threading
+
+import numpy as np
 import torch
 import pytesseract
-from typing import List, Dict, Any
+from numpy.lib import recfunctions
+from typing import ClassVar, Iterator, List, Dict, Any, Tuple
+
+from model_export import YOLOV5_HUB_REPO, supported_batch, yolov5_repo_dir
+from vision_utils import crop_batch, crop_with_padding, downscale_to_max_side, load_image, ocr_many, ocr_text, ocr_number
+
+log = logging.getLogger(__name__)
+
+# Struct-of-arrays layout of one image's raw model output
+DETECTION_DTYPE = np.dtype([
+    ('x1', 'f4'), ('y1', 'f4'), ('x2', 'f4'), ('y2', 'f4'),
+    ('conf', 'f4'), ('cls', 'u1'),
+])
+
+# Detection label -> (analyzer attribute holding its boxes, ordered left to right by x1);
+# box IDs are "<label>_<n>" in that order
+CATEGORY_ATTRS = {
+    'bar': ('bars', True),
+    'uptail': ('uptails', True),
+    'yaxis': ('yaxis', False),
+    'xaxis': ('xaxis', False),
+    'origin': ('origins', False),
+    'ymax': ('ymaxes', False),
+    'label': ('labels', False),
+    'x_group': ('x_groups', True),
+    'legend': ('legends', False),
+    'legend_group': ('legend_groups', False),
+}
+CATEGORY_RANK = {label: rank for rank, label in enumerate(CATEGORY_ATTRS)}
+CATEGORY_X_ORDERED = np.array([x_ordered for _, x_ordered in CATEGORY_ATTRS.values()])
+
+# Label -> ["<label>_1", "<label>_2", ...], grown on demand and shared by every analyzer
+_BOX_IDS: Dict[str, List[str]] = {label: [] for label in CATEGORY_ATTRS}
+
+
+def _box_ids(label: str, count: int) -> List[str]:
+    """Get the first `count` box IDs of a category without formatting them per box."""
+    ids = _BOX_IDS[label]
+    if len(ids) < count:
+        # Rebuilt and rebound rather than appended to, so concurrent readers never see a partial list
+        ids = [f"{label}_{n}" for n in range(1, max(count, 2 * len(ids), 64) + 1)]
+        _BOX_IDS[label] = ids
+    return ids
+
+
+@functools.lru_cache(maxsize=8)
+def _class_tables(class_names: Tuple[str, ...]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build the per-class lookup arrays for a model's class names, once per class list.
 
-from vision_utils import crop_with_padding, ocr_text, ocr_number
+    Returns:
+        (class index -> CATEGORY_ATTRS rank or -1, class index -> label), read-only
+    """
+    category = np.array([CATEGORY_RANK.get(name, -1) for name in class_names])
+    labels = np.array(class_names, dtype=object)
+    category.flags.writeable = False
+    labels.flags.writeable = False
+    return category, labels
+
+
+def _parse_number(value: Any) -> float | None:
+    """Parse an OCR'd or user-entered value as a float, or None if blank or not numeric."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
 
 
 class BarGraphAnalyzer:
@@ -20,34 +92,64 @@ class BarGraphAnalyzer:
     - Track and update box coordinates when modified
     """
 
-    def __init__(self, model_path: str, class_names: List[str], pytesseract_cmd: str | None = None) -> None:
+    # (weights path, mtime, compile mode, half) -> loaded model, shared by every analyzer in the process
+    _model_cache: ClassVar[Dict[Tuple[str, int, str | None, bool], Any]] = {}
+    _model_cache_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(
+        self,
+        model_path: str,
+        class_names: List[str],
+        pytesseract_cmd: str | None = None,
+        imgsz: int = 640,
+        model: Any | None = None,
+        conf_threshold: float | None = None,
+        compile_mode: str | None = None,
+        half: bool = True,
+    ) -> None:
         """
         Initialize the analyzer with model and class metadata.
 
         Args:
-            model_path: Filesystem path to YOLO weights (.pt).
+            model_path: Filesystem path to YOLO weights (.pt, or an exported .engine).
             class_names: Mapping of class indices to human-readable labels.
             pytesseract_cmd: Optional path to the tesseract binary.
+            imgsz: Inference size; must match the size an exported engine was built for.
+            model: Already loaded YOLO model to share instead of loading model_path again.
+            conf_threshold: Minimum detection confidence; None keeps the YOLOv5 default (0.25).
+            compile_mode: torch.compile mode for PyTorch weights (e.g. "default"); None runs eagerly.
+            half: Run PyTorch weights with FP16 autocast on CUDA; False keeps them in FP32.
         """
         if pytesseract_cmd:
             pytesseract.pytesseract.tesseract_cmd = pytesseract_cmd
 
-        # Load YOLOv5 custom model from torch hub (repo is cached after first download; Docker image pre-warms this)
-        self.model: Any = torch.hub.load(
-            'ultralytics/yolov5',
-            'custom',
-            path=model_path,
-            trust_repo=True,
-        )
-        self.class_names = class_names
+        self.model: Any = model if model is not None else self._load_model(model_path, compile_mode, half)
+        if model is None and conf_threshold is not None:
+            # Applied inside NMS on the model's device, before results are copied to the host
+            self.model.conf = conf_threshold
+        self.model_path = model_path
+        self.class_names = tuple(class_names)
+        self.imgsz = imgsz
+        # Class index -> CATEGORY_ATTRS rank (-1 for classes without a category) and
+        # class index -> label; shared by every analyzer spawned for the same classes
+        self._class_category, self._class_labels = _class_tables(self.class_names)
+
+        # Optional batching worker (attached by ModelManager); inference runs inline without it
+        self.inference_worker: Any | None = None
+        self.inference_timeout: float | None = None
+
+        # Serializes edits to this analyzer's per-image state across request threads
+        self.lock = threading.RLock()
 
         # Runtime state populated per image
+        self.upload_name: str | None = None  # content-addressed file under the upload dir
         self.image: Any | None = None
+        self.raw_detections: np.ndarray | None = None  # DETECTION_DTYPE, as detected
         self.detections: List[Dict[str, Any]] | None = None
 
-        # Semantic elements
-        self.origin_value: float | str = 0
-        self.ymax_value: float | str = 0
+        # Semantic elements (assigning a value also caches its parsed float)
+        self.origin_value = 0
+        self.ymax_value = 0
         self.origin_conversion_error: str | None = None
         self.ymax_conversion_error: str | None = None
         self.x_label_texts: List[str] = []
@@ -64,18 +166,192 @@ class BarGraphAnalyzer:
         self.x_groups: Dict[str, Dict[str, Any]] = {}
         self.legends: Dict[str, Dict[str, Any]] = {}
         self.legend_groups: Dict[str, Dict[str, Any]] = {}
+        # The dicts above in CATEGORY_ATTRS order; they are cleared, never rebound
+        self._category_dicts: Tuple[Dict[str, Dict[str, Any]], ...] = tuple(
+            getattr(self, attr) for attr, _ in CATEGORY_ATTRS.values()
+        )
+        # Box ID -> (label of the category dict holding it, box)
+        self._box_index: Dict[str, Tuple[str, Dict[str, Any]]] = {}
         
-    @property
-    def _category_dicts(self) -> List[Dict[str, Any]]:
+    @classmethod
+    def _load_model(cls, model_path: str, compile_mode: str | None = None, half: bool = True) -> Any:
         """
-        Dynamically return the current category dictionaries.
-        This ensures we always have the latest references.
+        Get the YOLO model for a weights file, loading it only once per process.
+
+        Analyzers constructed for the same (unchanged) weights share one model,
+        so building another analyzer does not re-read the checkpoint or engine.
+
+        Args:
+            model_path: Filesystem path to YOLO weights (.pt, or an exported .engine).
+            compile_mode: torch.compile mode for PyTorch weights, or None to run eagerly.
+            half: Use FP16 autocast for PyTorch weights on CUDA.
+
+        Returns:
+            The loaded YOLOv5 AutoShape model
         """
-        return [
-            self.bars, self.uptails, self.yaxis, self.xaxis,
-            self.origins, self.ymaxes, self.labels,
-            self.x_groups, self.legends, self.legend_groups
-        ]
+        key = (os.path.abspath(model_path), os.stat(model_path).st_mtime_ns, compile_mode, half)
+        with cls._model_cache_lock:
+            if key not in cls._model_cache:
+                cls._model_cache[key] = cls._hub_load(model_path, compile_mode, half)
+            return cls._model_cache[key]
+
+    @staticmethod
+    def _hub_load(model_path: str, compile_mode: str | None = None, half: bool = True) -> Any:
+        """Load YOLOv5 weights through torch.hub, preferring the locally cached repo."""
+        # Load YOLOv5 custom model from torch hub (repo is cached after first download; Docker image pre-warms this).
+        # DetectMultiBackend behind 'custom' picks the runtime from the file suffix, so a TensorRT
+        # .engine is loaded with its execution context and device bindings allocated once here.
+        repo_dir = yolov5_repo_dir()
+        if os.path.isdir(repo_dir):
+            # Local source skips the GitHub lookup torch.hub does for 'owner/repo'
+            model = torch.hub.load(repo_dir, 'custom', path=model_path, source='local')
+        else:
+            model = torch.hub.load(YOLOV5_HUB_REPO, 'custom', path=model_path, trust_repo=True)
+        if model_path.endswith('.pt'):
+            # NHWC is the native convolution layout of cuDNN's tensor-core kernels and of
+            # oneDNN on CPU; the conv weights are converted once and activations follow them
+            model.to(memory_format=torch.channels_last)
+        if model_path.endswith('.pt') and torch.cuda.is_available():
+            BarGraphAnalyzer._enable_fast_cuda_path(model, half)
+        if model_path.endswith('.pt') and compile_mode:
+            BarGraphAnalyzer._compile(model, compile_mode)
+        return model
+
+    @staticmethod
+    def _compile(model: Any, compile_mode: str) -> None:
+        """
+        Compile the network inside AutoShape with torch.compile, falling back to eager.
+
+        Its letterboxing and NMS stay unchanged; the first calls per input
+        shape pay the compile (see ModelManager.warmup). Graphs that fail to
+        compile later, at call time, run eagerly instead of raising.
+        """
+        if not hasattr(torch, 'compile'):
+            log.warning("torch.compile needs PyTorch 2.0+, running the detector eagerly")
+            return
+        try:
+            import torch._dynamo
+            torch._dynamo.config.suppress_errors = True
+            model.model = torch.compile(model.model, mode=compile_mode)
+        except (RuntimeError, OSError) as e:
+            log.warning("torch.compile failed, running the detector eagerly: %s", e)
+
+    @staticmethod
+    def _enable_fast_cuda_path(model: Any, half: bool = True) -> None:
+        """
+        Run the PyTorch model with FP16 autocast and tuned convolutions on CUDA.
+
+        YOLOv5's loader already places the model on the GPU. AutoShape wraps
+        its forward pass in autocast when `amp` is set, which routes the
+        (channels-last) convolutions through tensor cores. TF32 covers ops
+        left in FP32 (all of them with half=False, for weights that lose
+        accuracy in FP16). cuDNN autotuning picks the fastest convolution
+        kernels once per input shape; letterboxed inputs come in few shapes,
+        and warmup tunes the square ones.
+        """
+        torch.backends.cudnn.benchmark = True
+        torch.set_float32_matmul_precision('high')
+        model.amp = half
+
+    def spawn(self) -> BarGraphAnalyzer:
+        """
+        Create an analyzer with empty per-image state that shares this one's model.
+
+        Used to give each upload its own detections and edit state without
+        loading the YOLO weights again.
+
+        Returns:
+            BarGraphAnalyzer: New analyzer bound to the same model and inference worker
+        """
+        analyzer = BarGraphAnalyzer(
+            model_path=self.model_path,
+            class_names=self.class_names,
+            imgsz=self.imgsz,
+            model=self.model,
+        )
+        analyzer.inference_worker = self.inference_worker
+        analyzer.inference_timeout = self.inference_timeout
+        return analyzer
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Capture the per-image analysis state so it can be restored into another analyzer.
+
+        Box dicts are copied, so later edits in this analyzer do not leak into
+        the snapshot; the decoded image is shared (analyzers only read it).
+
+        Returns:
+            Dictionary understood by restore()
+        """
+        return {
+            'image': self.image,
+            'raw_detections': self.raw_detections,
+            'detections': [dict(det) for det in self.detections or []],
+            'origin_value': self.origin_value,
+            'ymax_value': self.ymax_value,
+            'origin_conversion_error': self.origin_conversion_error,
+            'ymax_conversion_error': self.ymax_conversion_error,
+            'x_label_texts': list(self.x_label_texts),
+            'label_text': self.label_text,
+        }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        """
+        Load per-image analysis state captured by snapshot(), skipping detection and OCR.
+
+        Args:
+            state: Dictionary returned by snapshot()
+        """
+        self.image = state['image']
+        self.raw_detections = state['raw_detections']
+        self.detections = [dict(det) for det in state['detections']]
+        self.origin_value = state['origin_value']
+        self.ymax_value = state['ymax_value']
+        self.origin_conversion_error = state['origin_conversion_error']
+        self.ymax_conversion_error = state['ymax_conversion_error']
+        self.x_label_texts = list(state['x_label_texts'])
+        self.label_text = state['label_text']
+        self._organize_detections()
+
+    @property
+    def origin_value(self) -> float | str:
+        """Origin (y axis bottom) value as OCR'd or entered by the user."""
+        return self._origin_value
+
+    @origin_value.setter
+    def origin_value(self, value: float | str) -> None:
+        self._origin_value = value
+        self.origin_float = _parse_number(value)
+
+    @property
+    def ymax_value(self) -> float | str:
+        """Y axis maximum value as OCR'd or entered by the user."""
+        return self._ymax_value
+
+    @ymax_value.setter
+    def ymax_value(self, value: float | str) -> None:
+        self._ymax_value = value
+        self.ymax_float = _parse_number(value)
+
+    def _category_dict(self, label: str) -> Dict[str, Dict[str, Any]]:
+        """Get the category dictionary holding boxes of a detection label."""
+        return self._category_dicts[CATEGORY_RANK[label]]
+
+    def _put_box(self, label: str, box_id: str, box: Dict[str, Any]) -> None:
+        """Store a box in its category dictionary and the ID index."""
+        self._category_dict(label)[box_id] = box
+        self._box_index[box_id] = (label, box)
+
+    def _find_box(self, box_id: str) -> Tuple[str, Dict[str, Any]] | None:
+        """Look up a box by ID, returning (category label, box) or None."""
+        return self._box_index.get(box_id)
+
+    def _pop_box(self, box_id: str) -> Tuple[str, Dict[str, Any]] | None:
+        """Remove a box from its category dictionary and the ID index."""
+        found = self._box_index.pop(box_id, None)
+        if found is not None:
+            del self._category_dict(found[0])[box_id]
+        return found
 
     def detect_box(self, image_path: str) -> None:
         """
@@ -84,25 +360,42 @@ class BarGraphAnalyzer:
         Args:
             image_path: Path to the image file to analyze
         """
-        # Load the image
-        self.image = cv2.imread(image_path)
+        self.detect_box_array(load_image(image_path))
 
-        # Run YOLO model on the image
-        results = self.model(self.image)
+    def detect_box_array(self, image: Any, detections: Any | None = None) -> None:
+        """
+        Run detection on an already decoded image and populate analyzer fields.
 
-        # Extract the detections (x1, y1, x2, y2, conf, cls)
-        detections = results.xyxy[0].numpy()
+        Args:
+            image: BGR image as a NumPy array (e.g. from vision_utils.decode_image)
+            detections: Model output for `image` from a batched pass; predicted here if None
+        """
+        self.image = image
+        if self.image is None:
+            return
+
+        # Run YOLO model on the image and extract the detections (x1, y1, x2, y2, conf, cls)
+        if detections is None:
+            detections = self._predict(self.image)
+        self.raw_detections = recfunctions.unstructured_to_structured(
+            detections, dtype=DETECTION_DTYPE
+        )
+
+        # Editable per-box dicts, converted column-wise: one tolist() per field
+        # (labels gathered by class index) instead of a call per value
+        columns = [self.raw_detections[name].tolist() for name in DETECTION_DTYPE.names]
+        columns.append(self._class_labels[self.raw_detections['cls']].tolist())
         self.detections = [
             {
-                "x1": float(x1),
-                "y1": float(y1),
-                "x2": float(x2),
-                "y2": float(y2),
-                "conf": float(conf),
-                "class": int(cls),
-                "label": self.class_names[int(cls)],
+                "x1": x1,
+                "y1": y1,
+                "x2": x2,
+                "y2": y2,
+                "conf": conf,
+                "class": cls,
+                "label": label,
             }
-            for x1, y1, x2, y2, conf, cls in detections
+            for x1, y1, x2, y2, conf, cls, label in zip(*columns)
         ]
 
         # First organize detections with IDs
@@ -119,9 +412,13 @@ class BarGraphAnalyzer:
         # Component validation now handled separately via get_component_status()
         # No validation errors raised here - let frontend handle component checking
 
-        # OCR numeric values and validate conversion (only if components exist)
-        origin_text = self.extract_numbers(self.image, origin) if origin else ''
-        ymax_text = self.extract_numbers(self.image, ymax) if ymax else ''
+        # OCR every region in one dispatch (only if components exist)
+        origin_text, ymax_text, label_text, *x_label_texts = self._ocr_regions([
+            (origin, 'number', False),
+            (ymax, 'number', False),
+            (label, 'text', True),
+            *((x_label, 'text', False) for x_label in x_groups),
+        ])
         
         # Try to convert to numbers and store conversion status
         self.origin_value = origin_text
@@ -129,24 +426,152 @@ class BarGraphAnalyzer:
         self.origin_conversion_error = None
         self.ymax_conversion_error = None
         
-        try:
-            float(origin_text) if origin_text else None
-        except ValueError:
+        if origin_text and self.origin_float is None:
             self.origin_conversion_error = f"Manual input needed for origin value: '{origin_text}'"
             
-        try:
-            float(ymax_text) if ymax_text else None
-        except ValueError:
+        if ymax_text and self.ymax_float is None:
             self.ymax_conversion_error = f"Manual input needed for ymax value: '{ymax_text}'"
         
         # OCR x-axis labels and main label (only if components exist)
-        self.x_label_texts = []
-        if x_groups:
-            for x_label in x_groups:
-                self.x_label_texts.append(self.extract_text(self.image, x_label))
+        self.x_label_texts = x_label_texts
 
         if label is not None:
-            self.label_text = self.extract_text(self.image, label, rotate=True)
+            self.label_text = label_text
+
+    def _ocr_regions(self, regions: List[Tuple[Dict[str, Any] | None, str, bool]]) -> List[str]:
+        """
+        OCR several regions of the current image in one dispatch.
+
+        All regions are cropped up front, top to bottom so the image rows are
+        walked in memory order, and then handed to vision_utils.ocr_many,
+        which runs them concurrently on the shared OCR pool (batched into
+        one tesseract process per configuration with pytesseract).
+
+        Args:
+            regions: (bbox or None, "text" or "number", rotate) per region
+
+        Returns:
+            OCR result per region, in input order ('' where bbox is None)
+        """
+        present = [i for i, (bbox, _, _) in enumerate(regions) if bbox is not None]
+        present.sort(key=lambda i: regions[i][0]['y1'])
+        bboxes = np.array([[regions[i][0][key] for key in ('x1', 'y1', 'x2', 'y2')] for i in present], dtype=np.float64)
+        views = crop_batch(self.image, bboxes)
+        crops = [(view, regions[i][1], regions[i][2]) for view, i in zip(views, present)]
+
+        texts = dict(zip(present, ocr_many(crops)))
+        return [texts.get(i, '') for i in range(len(regions))]
+
+    def detect_boxes_batch(self, image_paths: List[str], batch_size: int = 8) -> List[BarGraphAnalyzer]:
+        """
+        Run detection on several image files, batching the model forward passes.
+
+        Args:
+            image_paths: Paths to the image files to analyze
+            batch_size: Maximum number of images per forward pass without a worker (clamped to the weights' limit)
+
+        Returns:
+            One analyzer per path (sharing this one's model) with its fields populated
+        """
+        return self.detect_boxes_batch_array([load_image(path) for path in image_paths], batch_size)
+
+    def detect_boxes_batch_array(self, images: List[Any], batch_size: int = 8) -> List[BarGraphAnalyzer]:
+        """
+        Run detection on several decoded images, batching the model forward passes.
+
+        OCR and the per-image bookkeeping run per image as in detect_box_array.
+        With an inference worker attached every image is queued on it up
+        front, so the forward passes stay on the worker thread (never
+        overlapping another pass) while the OCR of earlier images runs here.
+        Images that failed to decode (None) get an analyzer with no image.
+
+        Args:
+            images: BGR images as NumPy arrays
+            batch_size: Maximum number of images per forward pass without a worker (clamped to the weights' limit)
+
+        Returns:
+            One analyzer per image, in input order (sharing this one's model)
+        """
+        analyzers = [self.spawn() for _ in images]
+        targets = [(index, image) for index, image in enumerate(images) if image is not None]
+        predictions = self._predict_many([image for _, image in targets], batch_size)
+        for (index, image), detections in zip(targets, predictions):
+            analyzers[index].detect_box_array(image, detections)
+        return analyzers
+
+    def _predict_many(self, images: List[Any], batch_size: int) -> Iterator[Any]:
+        """
+        Run the YOLO model on several images, yielding detections in input order.
+
+        Through the inference worker when attached (it forms the batches);
+        otherwise inline, `batch_size` images per forward pass, clamped to
+        what the loaded weights support (1 for TensorRT engines).
+
+        Args:
+            images: BGR images as NumPy arrays
+            batch_size: Maximum number of images per inline forward pass
+
+        Yields:
+            (N, 6) array of x1, y1, x2, y2, conf, cls rows per image, in its own coordinates.
+        """
+        scaled = [downscale_to_max_side(image, self.imgsz) for image in images]
+        if self.inference_worker is not None:
+            futures = [self.inference_worker.submit(model_input) for model_input, _ in scaled]
+            for future, (_, scale) in zip(futures, scaled):
+                yield self._to_image_coords(future.result(timeout=self.inference_timeout), scale)
+            return
+        step = supported_batch(self.model_path, batch_size)
+        for start in range(0, len(scaled), step):
+            chunk = scaled[start:start + step]
+            outputs = self.predict_batch([model_input for model_input, _ in chunk])
+            for detections, (_, scale) in zip(outputs, chunk):
+                yield self._to_image_coords(detections, scale)
+
+    @torch.inference_mode()
+    def predict_batch(self, images: List[Any]) -> List[Any]:
+        """
+        Run the YOLO model on several images in a single forward pass.
+
+        Runs under inference mode (no autograd bookkeeping) regardless of the
+        YOLOv5 release's own AutoShape decorators, which older ones lack.
+
+        Args:
+            images: List of BGR images as NumPy arrays
+
+        Returns:
+            One (N, 6) array of x1, y1, x2, y2, conf, cls rows per image.
+        """
+        results = self.model(images, size=self.imgsz)
+        # One device-to-host copy for the whole batch, then split per image
+        counts = [len(det) for det in results.xyxy]
+        stacked = torch.cat(results.xyxy).cpu().numpy()
+        return np.split(stacked, np.cumsum(counts)[:-1])
+
+    def _predict(self, image: Any) -> Any:
+        """
+        Run the YOLO model on one image, through the batching worker when attached.
+
+        Args:
+            image: BGR image as a NumPy array
+
+        Returns:
+            (N, 6) array of x1, y1, x2, y2, conf, cls rows in the coordinates of `image`.
+        """
+        # YOLO letterboxes to imgsz anyway; shrinking first keeps large uploads
+        # cheap to queue and resize. OCR keeps using the full-resolution image.
+        model_input, scale = downscale_to_max_side(image, self.imgsz)
+        if self.inference_worker is None:
+            detections = self.predict_batch([model_input])[0]
+        else:
+            detections = self.inference_worker.submit(model_input).result(timeout=self.inference_timeout)
+        return self._to_image_coords(detections, scale)
+
+    @staticmethod
+    def _to_image_coords(detections: Any, scale: float) -> Any:
+        """Map detections on a downscaled model input back to the original image (in place)."""
+        if scale < 1.0:
+            detections[:, :4] /= scale
+        return detections
 
     def get_component_status(self) -> Dict[str, Any]:
         """
@@ -175,21 +600,14 @@ class BarGraphAnalyzer:
                 missing_components.append(component_name)
         
         # Special handling for ymax and origin: consider manual input values
-        if 'ymax' in missing_components and self.ymax_value and self.ymax_value.strip():
-            try:
-                float(self.ymax_value)
-                missing_components.remove('ymax')
-                present_components['ymax'] = 'manual_input'
-            except ValueError:
-                pass  # Keep as missing if value can't be converted to float
+        # (values are parsed once when assigned; None means they can't be converted to float)
+        if 'ymax' in missing_components and self.ymax_float is not None:
+            missing_components.remove('ymax')
+            present_components['ymax'] = 'manual_input'
                 
-        if 'origin' in missing_components and self.origin_value and self.origin_value.strip():
-            try:
-                float(self.origin_value)
-                missing_components.remove('origin')
-                present_components['origin'] = 'manual_input'
-            except ValueError:
-                pass  # Keep as missing if value can't be converted to float
+        if 'origin' in missing_components and self.origin_float is not None:
+            missing_components.remove('origin')
+            present_components['origin'] = 'manual_input'
         
         return {
             'present_components': present_components,
@@ -202,95 +620,48 @@ class BarGraphAnalyzer:
         Organize detections into dictionaries with unique IDs and sort them.
         This method creates unique identifiers for each detection and organizes
         them into the appropriate category dictionaries.
+
+        Grouping and ordering is done with one stable NumPy lexsort over the
+        category and x1 columns of raw_detections (which self.detections
+        mirrors row for row after detection); only the final ID assignment
+        touches the per-box dicts.
         """
-        # Clear previous organization
-        self.bars = {}
-        self.uptails = {}
-        self.yaxis = {}
-        self.xaxis = {}
-        self.origins = {}
-        self.ymaxes = {}
-        self.labels = {}
-        self.x_groups = {}
-        self.legends = {}
-        self.legend_groups = {}
-        
-        # Organize detections by label using a mapping
-        detection_lists = {
-            'bar': [],
-            'uptail': [],
-            'yaxis': [],
-            'xaxis': [],
-            'origin': [],
-            'ymax': [],
-            'label': [],
-            'x_group': [],
-            'legend': [],
-            'legend_group': []
-        }
-        
-        for i, detection in enumerate(self.detections):
-            label = detection['label']
-            if label in detection_lists:
-                detection_lists[label].append(detection)
+        # Clear previous organization (in place: _category_dicts holds these dicts)
+        for category_dict in self._category_dicts:
+            category_dict.clear()
+        self._box_index.clear()
+
+        detections = self.detections or []
+        if not detections:
+            return
+
+        raw = self.raw_detections
+        if raw is not None and len(raw) == len(detections):
+            category = self._class_category[raw['cls']]
+            x1 = raw['x1']
+        else:
+            category = np.array([CATEGORY_RANK.get(d['label'], -1) for d in detections])
+            x1 = np.array([d['x1'] for d in detections], dtype=np.float32)
+
+        # Sort by category, then by x1 for x-ordered categories; lexsort is
+        # stable, so the rest keep detection order
+        x_ordered = CATEGORY_X_ORDERED[category] & (category >= 0)
+        order = np.lexsort((np.where(x_ordered, x1, 0.0), category))
+        known = order[category[order] >= 0]
+        if known.size == 0:
+            return
+        sorted_category = category[known]
+        starts = np.flatnonzero(np.diff(sorted_category)) + 1
+
+        labels = list(CATEGORY_ATTRS)
+        for group in np.split(known, starts):
+            label = labels[category[group[0]]]
+            for index, new_id in zip(group.tolist(), _box_ids(label, len(group))):
+                detection = detections[index]
                 # Store original index for stable identification
-                detection['original_index'] = i
-        
-        # Sort by x1 coordinate where applicable
-        sorted_bars = sorted(detection_lists['bar'], key=lambda bar: bar['x1'])
-        sorted_uptails = sorted(detection_lists['uptail'], key=lambda uptail: uptail['x1'])
-        sorted_x_groups = sorted(detection_lists['x_group'], key=lambda x_group: x_group['x1'])
-        
-        # Assign sequential IDs and organize
-        for i, bar in enumerate(sorted_bars):
-            new_id = f"bar_{i+1}"
-            bar['id'] = new_id
-            self.bars[new_id] = bar
-            
-        for i, uptail in enumerate(sorted_uptails):
-            new_id = f"uptail_{i+1}"
-            uptail['id'] = new_id
-            self.uptails[new_id] = uptail
-            
-        for i, yaxis in enumerate(detection_lists['yaxis']):
-            new_id = f"yaxis_{i+1}"
-            yaxis['id'] = new_id
-            self.yaxis[new_id] = yaxis
-            
-        for i, xaxis in enumerate(detection_lists['xaxis']):
-            new_id = f"xaxis_{i+1}"
-            xaxis['id'] = new_id
-            self.xaxis[new_id] = xaxis
-            
-        for i, origin in enumerate(detection_lists['origin']):
-            new_id = f"origin_{i+1}"
-            origin['id'] = new_id
-            self.origins[new_id] = origin
-            
-        for i, ymax in enumerate(detection_lists['ymax']):
-            new_id = f"ymax_{i+1}"
-            ymax['id'] = new_id
-            self.ymaxes[new_id] = ymax
-            
-        for i, label in enumerate(detection_lists['label']):
-            new_id = f"label_{i+1}"
-            label['id'] = new_id
-            self.labels[new_id] = label
-            
-        for i, x_group in enumerate(sorted_x_groups):
-            new_id = f"x_group_{i+1}"
-            x_group['id'] = new_id
-            self.x_groups[new_id] = x_group
-            
-        for i, legend in enumerate(detection_lists['legend']):
-            new_id = f"legend_{i+1}"
-            legend['id'] = new_id
-            self.legends[new_id] = legend
-            
-        for i, legend_group in enumerate(detection_lists['legend_group']):
-            new_id = f"legend_group_{i+1}"
-            legend_group['id'] = new_id
-            self.legend_groups[new_id] = legend_group
+                detection['original_index'] = index
+                detection['id'] = new_id
+                self._put_box(label, new_id, detection)
 
     def update_box_coordinates(self, box_id: str, x1: float, y1: float, x2: float, y2: float) -> bool:
         """
@@ -312,16 +683,13 @@ class BarGraphAnalyzer:
         if x1 >= x2 or y1 >= y2:
             raise ValueError("Invalid coordinates: x1 must be < x2 and y1 must be < y2")
             
-        # Find which category the box belongs to and update it
-        new_coords = {'x1': float(x1), 'y1': float(y1), 'x2': float(x2), 'y2': float(y2)}
-        
-        # Check all category dictionaries
-        for category_dict in self._category_dicts:
-            if box_id in category_dict:
-                category_dict[box_id].update(new_coords)
-                return True
-        
-        return False
+        # Find the box through the ID index and update it in place
+        found = self._find_box(box_id)
+        if found is None:
+            return False
+        box = found[1]
+        box['x1'], box['y1'], box['x2'], box['y2'] = float(x1), float(y1), float(x2), float(y2)
+        return True
 
     def get_box_by_id(self, box_id: str) -> Dict[str, Any] | None:
         """
@@ -333,12 +701,17 @@ class BarGraphAnalyzer:
         Returns:
             Dict[str, Any] | None: Box data or None if not found
         """
-        # Search in all category dictionaries
-        for category_dict in self._category_dicts:
-            if box_id in category_dict:
-                return category_dict[box_id]
-        
-        return None
+        found = self._find_box(box_id)
+        return found[1] if found else None
+
+    def get_detection_boxes(self) -> List[Dict[str, Any]]:
+        """
+        Get the current detection boxes of every category as one flat list.
+
+        Returns:
+            List of box dicts in category order, as sent to the frontend
+        """
+        return [box for category_dict in self._category_dicts for box in category_dict.values()]
 
     def get_all_boxes(self) -> Dict[str, Dict[str, Any]]:
         """
@@ -347,10 +720,7 @@ class BarGraphAnalyzer:
         Returns:
             Dict containing all detection categories with their boxes
         """
-        # Create a mapping of category names to their dictionaries
-        category_names = ['bars', 'uptails', 'yaxis', 'xaxis', 'origins', 
-                         'ymaxes', 'labels', 'x_groups', 'legends', 'legend_groups']
-        return dict(zip(category_names, self._category_dicts))
+        return {attr: getattr(self, attr) for attr, _ in CATEGORY_ATTRS.values()}
 
 
 
@@ -390,8 +760,9 @@ class BarGraphAnalyzer:
         results: Dict[str, Any] = {}
 
         # Convert to numbers (validation handled on frontend)
-        origin_value = float(self.origin_value)
-        ymax_value = float(self.ymax_value)
+        # (float() only runs for unparseable input, to raise the usual ValueError)
+        origin_value = self.origin_float if self.origin_float is not None else float(self.origin_value)
+        ymax_value = self.ymax_float if self.ymax_float is not None else float(self.ymax_value)
 
         # y-axis height in pixels (top - bottom). Get the first yaxis detection
         if not self.yaxis:
@@ -400,19 +771,9 @@ class BarGraphAnalyzer:
         yaxis_height = yaxis_obj['y1'] - yaxis_obj['y2']
         scale_factor = (ymax_value - origin_value) / yaxis_height
 
-        bar_heights: List[float] = []
-        for bar in self.bars.values():
-            bar_ymax = bar['y1']
-            bar_ymin = bar['y2']
-            height = (bar_ymax - bar_ymin) * scale_factor + origin_value
-            bar_heights.append(height)
-
-        uptail_heights: List[float] = []
-        for uptail in self.uptails.values():
-            uptail_ymax = uptail['y1']
-            uptail_ymin = uptail['y2']
-            height = (uptail_ymax - uptail_ymin) * scale_factor
-            uptail_heights.append(height)
+        # One vector expression per category over the boxes' (y1 - y2) spans
+        bar_heights: List[float] = (self._vertical_spans(self.bars) * scale_factor + origin_value).tolist()
+        uptail_heights: List[float] = (self._vertical_spans(self.uptails) * scale_factor).tolist()
 
         # Generate bar names - use x_label_texts if available, otherwise generate default names
         bar_names = []
@@ -434,6 +795,11 @@ class BarGraphAnalyzer:
         }
         return results
 
+    @staticmethod
+    def _vertical_spans(boxes: Dict[str, Dict[str, Any]]) -> np.ndarray:
+        """Pixel span (y1 - y2) of each box, in dictionary order, as a float64 array."""
+        return np.fromiter((box['y1'] - box['y2'] for box in boxes.values()), dtype=np.float64, count=len(boxes))
+
     def update_bar_names(self, bar_names: List[str]) -> bool:
         """
         Update the bar names in x_label_texts.
@@ -464,125 +830,40 @@ class BarGraphAnalyzer:
         Returns:
             bool: True if the category change was successful
         """
+        if new_category not in CATEGORY_ATTRS:
+            log.debug("Unknown category: %s", new_category)
+            return False
+        
         try:
-            # Find the box by original index in the detections list
-            box_data = None
-            old_category = None
-            
-            # Extract the index from the box_id (e.g., "label_1" -> 1, "ymax_2" -> 2)
-            try:
-                # Try to find by the generated ID first (for backward compatibility)
-                for category_dict in self._category_dicts:
-                    if box_id in category_dict:
-                        box_data = category_dict[box_id]
-                        # Determine which category this was
-                        if category_dict is self.bars:
-                            old_category = 'bar'
-                        elif category_dict is self.uptails:
-                            old_category = 'uptail'
-                        elif category_dict is self.yaxis:
-                            old_category = 'yaxis'
-                        elif category_dict is self.xaxis:
-                            old_category = 'xaxis'
-                        elif category_dict is self.origins:
-                            old_category = 'origin'
-                        elif category_dict is self.ymaxes:
-                            old_category = 'ymax'
-                        elif category_dict is self.labels:
-                            old_category = 'label'
-                        elif category_dict is self.x_groups:
-                            old_category = 'x_group'
-                        elif category_dict is self.legends:
-                            old_category = 'legend'
-                        elif category_dict is self.legend_groups:
-                            old_category = 'legend_group'
+            # Find the box by its generated ID first
+            found = self._pop_box(box_id)
+            
+            # If not found by ID, try to find by original index (e.g., "label_1" -> 0)
+            if found is None and '_' in box_id:
+                _, index_str = box_id.rsplit('_', 1)
+                index = int(index_str) - 1 if index_str.isdigit() else None  # 0-based
+                for detection in self.detections or []:
+                    if index is not None and detection.get('original_index') == index:
+                        # Drop it from whichever category currently holds it
+                        found = self._pop_box(detection.get('id')) or (detection.get('label'), detection)
                         break
-                
-                # If not found by ID, try to find by original index
-                if not box_data:
-                    # Parse the ID to get the index (e.g., "label_1" -> 1)
-                    if '_' in box_id:
-                        category_name, index_str = box_id.rsplit('_', 1)
-                        try:
-                            index = int(index_str) - 1  # Convert to 0-based index
-                            # Find the box in the original detections list
-                            for detection in self.detections:
-                                if detection.get('original_index') == index:
-                                    box_data = detection
-                                    old_category = detection.get('label', 'unknown')
-                                    break
-                        except ValueError:
-                            pass
-            except Exception as e:
-                print(f"Error parsing box_id {box_id}: {e}")
-                return False
             
-            if not box_data:
-                print(f"Box with ID {box_id} not found in any category")
-                print(f"Available categories and counts:")
-                print(f"  bars: {len(self.bars)}")
-                print(f"  uptails: {len(self.uptails)}")
-                print(f"  yaxis: {len(self.yaxis)}")
-                print(f"  xaxis: {len(self.xaxis)}")
-                print(f"  origins: {len(self.origins)}")
-                print(f"  ymaxes: {len(self.ymaxes)}")
-                print(f"  labels: {len(self.labels)}")
-                print(f"  x_groups: {len(self.x_groups)}")
-                print(f"  legends: {len(self.legends)}")
-                print(f"  legend_groups: {len(self.legend_groups)}")
+            if found is None:
+                log.debug(
+                    "Box with ID %s not found in any category; counts=%s",
+                    box_id, {attr: len(getattr(self, attr)) for attr, _ in CATEGORY_ATTRS.values()},
+                )
                 return False
             
-            # Remove from old category
-            if old_category == 'bar':
-                del self.bars[box_id]
-            elif old_category == 'uptail':
-                del self.uptails[box_id]
-            elif old_category == 'yaxis':
-                del self.yaxis[box_id]
-            elif old_category == 'xaxis':
-                del self.xaxis[box_id]
-            elif old_category == 'origin':
-                del self.origins[box_id]
-            elif old_category == 'ymax':
-                del self.ymaxes[box_id]
-            elif old_category == 'label':
-                del self.labels[box_id]
-            elif old_category == 'x_group':
-                del self.x_groups[box_id]
-            elif old_category == 'legend':
-                del self.legends[box_id]
-            elif old_category == 'legend_group':
-                del self.legend_groups[box_id]
-            
-            # Update the box's label
+            # Update the box's label and add it to the new category,
+            # keeping the original ID for consistency
+            _, box_data = found
             box_data['label'] = new_category
-            
-            # Add to new category but keep the original ID for consistency
-            if new_category == 'bar':
-                self.bars[box_id] = box_data
-            elif new_category == 'uptail':
-                self.uptails[box_id] = box_data
-            elif new_category == 'yaxis':
-                self.yaxis[box_id] = box_data
-            elif new_category == 'xaxis':
-                self.xaxis[box_id] = box_data
-            elif new_category == 'origin':
-                self.origins[box_id] = box_data
-            elif new_category == 'ymax':
-                self.ymaxes[box_id] = box_data
-            elif new_category == 'label':
-                self.labels[box_id] = box_data
-            elif new_category == 'x_group':
-                self.x_groups[box_id] = box_data
-            elif new_category == 'legend':
-                self.legends[box_id] = box_data
-            elif new_category == 'legend_group':
-                self.legend_groups[box_id] = box_data
-            
+            self._put_box(new_category, box_id, box_data)
             return True
             
         except Exception as e:
-            print(f"Error changing box category: {e}")
+            log.exception("Error changing box category: %s", e)
             return False
 
     def add_new_box(self, box_data: Dict[str, Any]) -> str:
@@ -604,7 +885,7 @@ class BarGraphAnalyzer:
             required_fields = ['x1', 'y1', 'x2', 'y2', 'label']
             for field in required_fields:
                 if field not in box_data:
-                    print(f"Missing required field: {field}")
+                    log.debug("Missing required field: %s", field)
                     return None
             
             # Create a copy of the box data
@@ -612,39 +893,11 @@ class BarGraphAnalyzer:
             
             # Generate a unique ID for the new box
             label = new_box['label']
-            if label == 'bar':
-                new_id = f"bar_{len(self.bars) + 1}"
-                self.bars[new_id] = new_box
-            elif label == 'uptail':
-                new_id = f"uptail_{len(self.uptails) + 1}"
-                self.uptails[new_id] = new_box
-            elif label == 'yaxis':
-                new_id = f"yaxis_{len(self.yaxis) + 1}"
-                self.yaxis[new_id] = new_box
-            elif label == 'xaxis':
-                new_id = f"xaxis_{len(self.xaxis) + 1}"
-                self.xaxis[new_id] = new_box
-            elif label == 'origin':
-                new_id = f"origin_{len(self.origins) + 1}"
-                self.origins[new_id] = new_box
-            elif label == 'ymax':
-                new_id = f"ymax_{len(self.ymaxes) + 1}"
-                self.ymaxes[new_id] = new_box
-            elif label == 'label':
-                new_id = f"label_{len(self.labels) + 1}"
-                self.labels[new_id] = new_box
-            elif label == 'x_group':
-                new_id = f"x_group_{len(self.x_groups) + 1}"
-                self.x_groups[new_id] = new_box
-            elif label == 'legend':
-                new_id = f"legend_{len(self.legends) + 1}"
-                self.legends[new_id] = new_box
-            elif label == 'legend_group':
-                new_id = f"legend_group_{len(self.legend_groups) + 1}"
-                self.legend_groups[new_id] = new_box
-            else:
-                print(f"Unknown label: {label}")
+            if label not in CATEGORY_ATTRS:
+                log.debug("Unknown label: %s", label)
                 return None
+            new_id = f"{label}_{len(self._category_dict(label)) + 1}"
+            self._put_box(label, new_id, new_box)
             
             # Set the ID in the box data
             new_box['id'] = new_id
@@ -654,11 +907,11 @@ class BarGraphAnalyzer:
                 self.detections = []
             self.detections.append(new_box)
             
-            print(f"Added new box with ID: {new_id} to category: {label}")
+            log.debug("Added new box with ID: %s to category: %s", new_id, label)
             return new_id
             
         except Exception as e:
-            print(f"Error adding new box: {e}")
+            log.exception("Error adding new box: %s", e)
             return None
 
     def remove_box(self, box_id: str) -> bool:
@@ -672,79 +925,29 @@ class BarGraphAnalyzer:
             bool: True if the box was successfully removed
         """
         try:
-            # Find the box in any of the category dictionaries
-            box_data = None
-            old_category = None
-            
-            # Check all category dictionaries to find the box
-            for category_dict in self._category_dicts:
-                if box_id in category_dict:
-                    box_data = category_dict[box_id]
-                    # Determine which category this was
-                    if category_dict is self.bars:
-                        old_category = 'bar'
-                    elif category_dict is self.uptails:
-                        old_category = 'uptail'
-                    elif category_dict is self.yaxis:
-                        old_category = 'yaxis'
-                    elif category_dict is self.xaxis:
-                        old_category = 'xaxis'
-                    elif category_dict is self.origins:
-                        old_category = 'origin'
-                    elif category_dict is self.ymaxes:
-                        old_category = 'ymax'
-                    elif category_dict is self.labels:
-                        old_category = 'label'
-                    elif category_dict is self.x_groups:
-                        old_category = 'x_group'
-                    elif category_dict is self.legends:
-                        old_category = 'legend'
-                    elif category_dict is self.legend_groups:
-                        old_category = 'legend_group'
-                    break
-            
-            if not box_data:
-                print(f"Box with ID {box_id} not found for removal")
+            # Find the box and drop it from its category dictionary
+            found = self._pop_box(box_id)
+            if found is None:
+                log.debug("Box with ID %s not found for removal", box_id)
                 return False
-            
-            # Remove from the appropriate category dictionary
-            if old_category == 'bar':
-                del self.bars[box_id]
-            elif old_category == 'uptail':
-                del self.uptails[box_id]
-            elif old_category == 'yaxis':
-                del self.yaxis[box_id]
-            elif old_category == 'xaxis':
-                del self.xaxis[box_id]
-            elif old_category == 'origin':
-                del self.origins[box_id]
-            elif old_category == 'ymax':
-                del self.ymaxes[box_id]
-            elif old_category == 'label':
-                del self.labels[box_id]
-            elif old_category == 'x_group':
-                del self.x_groups[box_id]
-            elif old_category == 'legend':
-                del self.legends[box_id]
-            elif old_category == 'legend_group':
-                del self.legend_groups[box_id]
+            old_category, _ = found
             
             # Remove from detections list if it exists
             if self.detections:
                 self.detections = [det for det in self.detections if det.get('id') != box_id]
             
-            print(f"Successfully removed box {box_id} from category {old_category}")
+            log.debug("Successfully removed box %s from category %s", box_id, old_category)
             return True
             
         except Exception as e:
-            print(f"Error removing box {box_id}: {e}")
+            log.exception("Error removing box %s: %s", box_id, e)
             return False
 
 
 if __name__ == "__main__":
-    # Simple manual test harness (adjust paths as needed)
-    model_path = 'models/best.pt'
-    class_names = ['label', 'ymax', 'origin', 'yaxis', 'bar', 'uptail', 'legend', 'legend_group', 'xaxis', 'x_group']
-    analyzer = BarGraphAnalyzer(model_path, class_names, pytesseract_cmd='/opt/homebrew/bin/tesseract')
+    # Simple manual test harness (adjust paths as needed); settings come from config
+    # so the class list and weights path cannot drift from the served model
+    from config import MODEL_PATH, CLASS_NAMES, TESSERACT_CMD
+    analyzer = BarGraphAnalyzer(MODEL_PATH, CLASS_NAMES, pytesseract_cmd=TESSERACT_CMD)
     # analyzer.detect_box('/path/to/image.png')
     # print(analyzer.calculate_heights())
\ No newline at end of file
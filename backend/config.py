@@ -6,14 +6,27 @@ used throughout the application.
 """
 
 import os
+import secrets
 from typing import List
 
+# Native thread pools: requests already run concurrently on gunicorn threads,
+# so OpenBLAS's pool under numpy only oversubscribes the cores. Read once at
+# library init, so this module must be imported before numpy/cv2. OpenMP is
+# not capped process-wide: OMP_THREAD_LIMIT would also bind PyTorch's
+# intra-op pool, which the single inference worker thread relies on for CPU
+# inference speed. vision_utils caps only the tesseract subprocesses.
+os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+
 # Base directory configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Upload configuration
 UPLOAD_DIR = os.path.join(BASE_DIR, 'static', 'uploads')
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+ALLOWED_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg'})
+# Uploaded images are immutable per session, so browsers may cache them for a year
+UPLOAD_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+# Uploads up to this size are parsed straight into memory (larger requests get 413)
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
 
 # Model configuration
 MODEL_PATH = os.path.join(BASE_DIR, 'models', 'best.pt')
@@ -22,11 +35,61 @@ CLASS_NAMES = [
     'legend', 'legend_group', 'xaxis', 'x_group'
 ]
 
+# Inference backend configuration
+# MODEL_FORMAT selects the weights the detector runs on: "pt" loads MODEL_PATH
+# directly, "engine" exports it once to a TensorRT engine cached next to it, and
+# "onnx" exports it once to ONNX run by onnxruntime (CUDA provider when available),
+# and "onnx-int8" additionally quantizes that export using the images in MODEL_CALIB_DIR.
+# "auto" uses whichever of those exports already exists and is current, else MODEL_PATH.
+MODEL_FORMAT = os.environ.get("MODEL_FORMAT", "pt").lower()
+MODEL_IMGSZ = int(os.environ.get("MODEL_IMGSZ", "640"))
+MODEL_HALF = os.environ.get("MODEL_HALF", "true").lower() in ("1", "true", "yes")
+MODEL_TRT_WORKSPACE = int(os.environ.get("MODEL_TRT_WORKSPACE", "4"))  # GB
+MODEL_CALIB_DIR = os.environ.get("MODEL_CALIB_DIR", os.path.join(BASE_DIR, 'models', 'calibration'))
+MODEL_CONF = float(os.environ.get("MODEL_CONF", "0.25"))  # minimum detection confidence
+# torch.compile mode for the PyTorch weights (e.g. "default", "max-autotune"); empty runs eagerly
+MODEL_COMPILE = os.environ.get("MODEL_COMPILE", "").strip() or None
+
+# Batched inference worker: concurrent uploads that arrive within
+# INFERENCE_MAX_WAIT_MS of each other share one forward pass
+INFERENCE_MAX_BATCH = int(os.environ.get("INFERENCE_MAX_BATCH", "8"))
+INFERENCE_MAX_WAIT_MS = float(os.environ.get("INFERENCE_MAX_WAIT_MS", "5"))
+INFERENCE_TIMEOUT = float(os.environ.get("INFERENCE_TIMEOUT", "60"))
+# Dummy forward passes at startup (CUDA/cuDNN/TensorRT lazy init) and, if
+# MODEL_KEEPALIVE > 0, every that many seconds to keep the device warm
+MODEL_WARMUP_RUNS = int(os.environ.get("MODEL_WARMUP_RUNS", "3"))
+MODEL_KEEPALIVE = float(os.environ.get("MODEL_KEEPALIVE", "0"))
+
+# Analysis sessions: each upload keeps its own detections/edit state in memory
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", "32"))
+SESSION_TTL = int(os.environ.get("SESSION_TTL", "3600"))  # seconds since last request
+SESSION_HEADER = "X-Session-Id"
+# Analysis results of recent uploads, keyed by content hash, replayed for identical re-uploads
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "16"))
+
 # Flask configuration
-SECRET_KEY = "b'\xca\xa4\xf2\x80!\xfe\x85\xba\xd7\xcf\xe7\xc9\xf1)I\xac\x10Y5M\x95\xed\xfb\xc4'"
+# Read from the environment; without it a random per-process key is used
+SECRET_KEY = os.environ.get("SECRET_KEY") or secrets.token_hex(32)
 HOST = "0.0.0.0"
 PORT = int(os.environ.get("PORT", "9000"))
 DEBUG = os.environ.get("DEBUG", "true").lower() in ("1", "true", "yes")
 
 # OCR configuration
-TESSERACT_CMD = 'tesseract' 
\ No newline at end of file
+TESSERACT_CMD = 'tesseract'
+# Process-wide OCR memo keyed by a digest of the crop's pixels (0 disables it)
+OCR_CACHE_SIZE = int(os.environ.get("OCR_CACHE_SIZE", "4096"))
+# Tesseract calls release the GIL, so one shared pool runs independent crops in
+# parallel and bounds concurrent tesseract processes across requests. More
+# threads than usable cores only adds contention, so the default follows the
+# CPU affinity mask (container CPU sets) rather than the host's core count.
+_USABLE_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", str(_USABLE_CPUS)))
+# Batch regions that share a Tesseract configuration into one tesseract process
+# (only used with the pytesseract fallback; tesserocr keeps its data loaded)
+OCR_BATCH = os.environ.get("OCR_BATCH", "true").lower() in ("1", "true", "yes")
+# Optional height cap for crops scaled up for OCR: narrow regions (a single
+# tick digit) otherwise reach several hundred pixels at the target width.
+# Off by default since it changes the pixels Tesseract reads; opt in per deployment.
+OCR_MAX_HEIGHT = int(os.environ.get("OCR_MAX_HEIGHT", "0"))  # 0 disables the cap
+# OCR crops are tiny; OpenCV's own worker pool costs more in handoff than it saves
+CV_NUM_THREADS = int(os.environ.get("CV_NUM_THREADS", "1")) 
\ No newline at end of file
@@ -5,7 +5,11 @@ This module contains helper functions for file operations, validation,
 and other common tasks.
 """
 
+import glob
 import os
+import shutil
+import threading
+import time
 from typing import Optional
 from werkzeug.utils import secure_filename
 from config import ALLOWED_EXTENSIONS
@@ -27,15 +31,19 @@ def allowed_file(filename: str) -> bool:
         >>> allowed_file("document.pdf")
         False
     """
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    _, dot, extension = filename.rpartition('.')
+    return bool(dot) and extension.lower() in ALLOWED_EXTENSIONS
 
 
 def clear_upload_folder(upload_dir: str) -> None:
     """
     Clear all files from the upload directory.
     
-    This function removes all files and symbolic links from the specified
-    upload directory. If the directory doesn't exist, it creates it.
+    The directory is renamed aside and recreated empty, which is a constant
+    number of syscalls regardless of how many files it holds; the renamed
+    copy is deleted on a background thread. If the rename is not possible
+    (e.g. the directory is a mount point), files are removed one by one.
+    If the directory doesn't exist, it creates it.
     
     Args:
         upload_dir (str): Path to the upload directory to clear
@@ -47,14 +55,62 @@ def clear_upload_folder(upload_dir: str) -> None:
     if not os.path.isdir(upload_dir):
         os.makedirs(upload_dir, exist_ok=True)
         return
+    
+    base = os.path.normpath(upload_dir)
+    stale_dir = f"{base}.old.{os.getpid()}.{time.time_ns()}"
+    try:
+        os.rename(base, stale_dir)
+    except OSError:
+        _remove_files(upload_dir)
+        return
+    
+    os.makedirs(upload_dir, exist_ok=True)
+    threading.Thread(
+        target=_remove_stale_dirs,
+        args=(base,),
+        name="upload-cleanup",
+        daemon=True,
+    ).start()
+
+
+def _remove_stale_dirs(base: str) -> None:
+    """Delete directories renamed aside by clear_upload_folder, including leftovers from earlier runs."""
+    for stale_dir in glob.glob(glob.escape(base) + ".old.*"):
+        shutil.rmtree(stale_dir, ignore_errors=True)
+
+
+def _remove_files(upload_dir: str) -> None:
+    """Remove every file, symbolic link and subdirectory inside upload_dir."""
+    # DirEntry caches the file type from readdir(), so no per-file stat() is needed
+    with os.scandir(upload_dir) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False) or entry.is_symlink():
+                    os.unlink(entry.path)
+                elif entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+            except OSError as e:
+                print(f'Failed to delete {entry.path}. Reason: {e}')
+
+
+def write_file(file_path: str, data: bytes) -> None:
+    """
+    Write raw bytes to a file, replacing any existing file.
+    
+    The data goes to a temporary file that is renamed into place, so a
+    concurrent reader never sees a partially written file.
+    
+    Args:
+        file_path (str): Destination path
+        data (bytes): Contents to write
         
-    for filename in os.listdir(upload_dir):
-        file_path = os.path.join(upload_dir, filename)
-        try:
-            if os.path.isfile(file_path) or os.path.islink(file_path):
-                os.unlink(file_path)
-        except Exception as e:
-            print(f'Failed to delete {file_path}. Reason: {e}')
+    Example:
+        >>> write_file("/path/to/uploads/image.png", file.read())
+    """
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, file_path)
 
 
 def get_secure_filename(file) -> Optional[str]:
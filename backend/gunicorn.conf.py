@@ -0,0 +1,50 @@
+"""
+Gunicorn configuration for the AutoExtract backend.
+
+Usage (from backend/):
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Every setting can be overridden through the environment variables below.
+"""
+
+import os
+import sys
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '9000')}"
+
+# Threaded workers: requests wait on Tesseract subprocesses and the batching
+# inference worker, both of which release the GIL.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+
+# Analysis state (detections, edited boxes, origin/ymax) lives in process
+# memory, so follow-up edit requests must reach the process that analyzed the
+# upload; scale with threads unless requests are pinned to a worker.
+workers = int(os.environ.get("GUNICORN_WORKERS", "1"))
+
+# Load the model once in the master before forking so workers share its pages
+# copy-on-write. CUDA contexts do not survive fork, so with a visible GPU the
+# default is off and each worker loads and warms the model on CUDA itself.
+# The NVML-based check answers without initializing CUDA in the master.
+os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import config  # noqa: E402,F401  (caps native thread pools before torch loads)
+import torch  # noqa: E402
+
+_preload_default = "false" if torch.cuda.is_available() else "true"
+preload_app = os.environ.get("GUNICORN_PRELOAD", _preload_default).lower() in ("1", "true", "yes")
+
+# Long timeout: first YOLO / torch load and image analysis can be slow on CPU
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "300"))
+keepalive = 5
+
+# send_from_directory hands uploads to gunicorn's wsgi.file_wrapper, which
+# copies them file-to-socket with sendfile(2) instead of a Python read/write
+# loop. Set GUNICORN_SENDFILE=false only on filesystems that do not support it.
+sendfile = os.environ.get("GUNICORN_SENDFILE", "true").lower() in ("1", "true", "yes")
+
+
+def post_fork(server, worker):
+    """Start the model keepalive thread in each worker (threads do not survive fork)."""
+    from model_manager import model_manager
+    model_manager.start_keepalive()
@@ -0,0 +1,117 @@
+"""
+Inference worker for AutoExtract backend application.
+
+This module runs model inference on a single persistent background thread.
+Concurrent requests are queued, grouped into small batches and run through
+the model in one forward pass, with results handed back through futures.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Tuple
+
+import numpy as np
+
+
+class InferenceWorker:
+    """
+    Batches concurrent inference requests onto one background thread.
+
+    The first queued image starts a batch; the worker then waits up to
+    `max_wait_ms` for more images (at most `max_batch` in total) before
+    running them through `predict_batch` together.
+    """
+
+    def __init__(
+        self,
+        predict_batch: Callable[[List[np.ndarray]], List[Any]],
+        max_batch: int = 8,
+        max_wait_ms: float = 5.0,
+    ) -> None:
+        """
+        Start the worker thread.
+
+        Args:
+            predict_batch: Callable mapping a list of BGR images to one result per image.
+            max_batch: Maximum number of images per forward pass.
+            max_wait_ms: How long to wait for a batch to fill once it has started.
+        """
+        self._predict_batch = predict_batch
+        self._max_batch = max(1, max_batch)
+        self._max_wait = max_wait_ms / 1000.0
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._queue: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue()
+        self._ensure_thread()
+
+    @property
+    def max_batch(self) -> int:
+        """Maximum number of images run through the model in one forward pass."""
+        return self._max_batch
+
+    def _ensure_thread(self) -> None:
+        """
+        Start the worker thread, or restart it in a forked child process.
+
+        Threads do not survive fork, so a worker created before gunicorn's
+        preload fork is re-armed on first use in each worker process.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            thread = threading.Thread(target=self._run, args=(self._queue,), name="inference-worker", daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, image: np.ndarray) -> Future:
+        """
+        Queue an image for inference.
+
+        Args:
+            image: BGR image as a NumPy array.
+
+        Returns:
+            Future resolving to the model output for this image.
+        """
+        self._ensure_thread()
+        future: Future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def _drain(self, jobs: queue.Queue) -> List[Tuple[np.ndarray, Future]]:
+        """Block for the first queued item, then collect a batch behind it."""
+        items = [jobs.get()]
+        deadline = time.monotonic() + self._max_wait
+        while len(items) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(jobs.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self, jobs: queue.Queue) -> None:
+        """Worker loop: drain a batch, run one forward pass, scatter results."""
+        while True:
+            items = self._drain(jobs)
+            images = [image for image, _ in items]
+            try:
+                outputs = self._predict_batch(images)
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), output in zip(items, outputs):
+                future.set_result(output)
+            for _, future in items[len(outputs):]:
+                future.set_exception(RuntimeError(
+                    f"Model returned {len(outputs)} outputs for a batch of {len(items)} images"
+                ))
@@ -0,0 +1,273 @@
+"""
+Model export utilities for AutoExtract backend application.
+
+This module converts the PyTorch YOLOv5 checkpoint into optimized inference
+formats (TensorRT engines, FP32 or INT8-quantized ONNX for onnxruntime) and caches the results next to the weights,
+so the export cost is paid once rather than on every start.
+"""
+
+import glob
+import json
+import os
+import sys
+from typing import Any, Dict, Iterator
+
+import cv2
+import numpy as np
+
+import torch
+
+YOLOV5_HUB_REPO = 'ultralytics/yolov5'
+
+# File suffix produced by YOLOv5's exporter for each supported format
+EXPORT_SUFFIXES = {
+    'engine': '.engine',
+    'onnx': '.onnx',
+    'onnx-int8': '.int8.onnx',
+}
+
+# Formats exported with a dynamic batch axis (TensorRT engines are built for batch 1)
+DYNAMIC_BATCH_FORMATS = frozenset({'onnx', 'onnx-int8'})
+
+CALIBRATION_EXTENSIONS = ('*.png', '*.jpg', '*.jpeg')
+
+
+def exported_path(model_path: str, fmt: str) -> str:
+    """
+    Get the path an exported model is cached at for a given format.
+
+    Args:
+        model_path (str): Path to the source PyTorch weights (.pt)
+        fmt (str): Export format key from EXPORT_SUFFIXES
+
+    Returns:
+        str: Path of the exported model next to the source weights
+
+    Example:
+        >>> exported_path("/app/models/best.pt", "engine")
+        '/app/models/best.engine'
+    """
+    return os.path.splitext(model_path)[0] + EXPORT_SUFFIXES[fmt]
+
+
+def supported_batch(model_path: str, max_batch: int) -> int:
+    """
+    Get the largest batch a weights file can run in one forward pass.
+
+    PyTorch weights and the ONNX exports take a dynamic batch axis; TensorRT
+    engines are built for batch 1.
+
+    Args:
+        model_path (str): Path to the weights the detector loads
+        max_batch (int): Batch size wanted
+
+    Returns:
+        int: `max_batch` (at least 1) if the format allows it, else 1
+    """
+    dynamic_suffixes = ('.pt',) + tuple(EXPORT_SUFFIXES[fmt] for fmt in DYNAMIC_BATCH_FORMATS)
+    return max(1, max_batch) if model_path.endswith(dynamic_suffixes) else 1
+
+
+def _settings_path(export_path: str) -> str:
+    """Sidecar file recording the settings an export was built with."""
+    return export_path + '.json'
+
+
+def _read_settings(export_path: str) -> Dict[str, Any] | None:
+    """Load the build settings of an export, or None if they were not recorded."""
+    try:
+        with open(_settings_path(export_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_export_fresh(model_path: str, export_path: str, settings: Dict[str, Any] | None = None) -> bool:
+    """
+    Check whether a cached export exists, is newer than its source weights and matches the settings.
+
+    TensorRT engines are built for a fixed input size and precision, so an
+    engine built with different settings must not be reused.
+
+    Args:
+        model_path (str): Path to the source PyTorch weights
+        export_path (str): Path to the exported model
+        settings (Dict[str, Any] | None): Build settings the export must have been made with
+
+    Returns:
+        bool: True if the export can be reused, False if it must be rebuilt
+    """
+    return (
+        os.path.isfile(export_path)
+        and os.path.getmtime(export_path) >= os.path.getmtime(model_path)
+        and (settings is None or _read_settings(export_path) == settings)
+    )
+
+
+def yolov5_repo_dir() -> str:
+    """Directory torch.hub caches the YOLOv5 repository in."""
+    return os.path.join(torch.hub.get_dir(), 'ultralytics_yolov5_master')
+
+
+def find_fresh_export(model_path: str, imgsz: int) -> str | None:
+    """
+    Find an existing export of the weights that can be loaded without rebuilding.
+
+    TensorRT engines are only considered with a CUDA device; among the rest,
+    INT8 ONNX is preferred over FP32 ONNX.
+
+    Args:
+        model_path (str): Path to the source PyTorch weights (.pt)
+        imgsz (int): Input size the export must have been built for
+
+    Returns:
+        str | None: Path to the preferred fresh export, or None if there is none
+    """
+    formats = (['engine'] if torch.cuda.is_available() else []) + ['onnx-int8', 'onnx']
+    for fmt in formats:
+        target = exported_path(model_path, fmt)
+        if is_export_fresh(model_path, target) and (_read_settings(target) or {}).get('imgsz') == imgsz:
+            return target
+    return None
+
+
+def _import_yolov5_export():
+    """
+    Import the `export` module of the YOLOv5 repository cached by torch.hub.
+
+    The repository is fetched into the hub cache first if it is not there yet
+    (the Docker image pre-warms this cache at build time).
+    """
+    repo_dir = yolov5_repo_dir()
+    if not os.path.isdir(repo_dir):
+        torch.hub.list(YOLOV5_HUB_REPO, trust_repo=True)
+    if repo_dir not in sys.path:
+        sys.path.insert(0, repo_dir)
+    import export  # noqa: E402  (YOLOv5 repo module)
+    return export
+
+
+def export_model(
+    model_path: str,
+    fmt: str,
+    imgsz: int = 640,
+    half: bool = True,
+    workspace: int = 4,
+    calib_dir: str | None = None,
+) -> str:
+    """
+    Export YOLOv5 weights to an optimized format, reusing a fresh cached export.
+
+    Args:
+        model_path (str): Path to the source PyTorch weights (.pt)
+        fmt (str): Export format key from EXPORT_SUFFIXES (e.g. "engine")
+        imgsz (int): Square input size the exported model is built for
+        half (bool): Build a TensorRT engine in FP16 (ONNX exports stay FP32)
+        workspace (int): TensorRT builder workspace in GB (more lets it try more tactics)
+        calib_dir (str | None): Directory of representative chart images for INT8 calibration
+
+    Returns:
+        str: Path to the exported model
+
+    Raises:
+        ValueError: If the format is not supported or INT8 has no calibration images
+        RuntimeError: If the export requires a GPU that is not available
+    """
+    if fmt not in EXPORT_SUFFIXES:
+        raise ValueError(f"Unsupported model format: {fmt}")
+    if fmt == 'onnx-int8':
+        return _export_onnx_int8(model_path, imgsz, calib_dir)
+
+    target = exported_path(model_path, fmt)
+    dynamic = fmt in DYNAMIC_BATCH_FORMATS
+    # YOLOv5 only exports FP16 on a GPU; FP16 ONNX is slower on onnxruntime's CPU provider
+    half = half and fmt == 'engine'
+    settings = {'imgsz': imgsz, 'half': half, 'workspace': workspace, 'dynamic': dynamic}
+    if is_export_fresh(model_path, target, settings):
+        return target
+
+    if fmt == 'engine' and not torch.cuda.is_available():
+        raise RuntimeError("TensorRT export requires a CUDA device")
+
+    export = _import_yolov5_export()
+    export.run(
+        weights=model_path,
+        imgsz=(imgsz, imgsz),
+        include=(fmt,),
+        half=half,
+        simplify=True,
+        dynamic=dynamic,
+        workspace=workspace,
+        device='0' if fmt == 'engine' else 'cpu',
+    )
+    if not os.path.isfile(target):
+        raise RuntimeError(f"Export to {fmt} did not produce {target}")
+    with open(_settings_path(target), 'w') as f:
+        json.dump(settings, f)
+    return target
+
+
+def _calibration_images(calib_dir: str | None) -> list:
+    """List the calibration image files in a directory."""
+    if not calib_dir or not os.path.isdir(calib_dir):
+        raise ValueError("INT8 export needs MODEL_CALIB_DIR pointing at representative chart images")
+    paths = sorted(p for pattern in CALIBRATION_EXTENSIONS for p in glob.glob(os.path.join(calib_dir, pattern)))
+    if not paths:
+        raise ValueError(f"No calibration images found in {calib_dir}")
+    return paths
+
+
+def _calibration_batches(paths: list, imgsz: int) -> Iterator[np.ndarray]:
+    """Yield calibration inputs preprocessed like YOLOv5's letterbox: RGB, CHW, 0-1, padded square."""
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        height, width = image.shape[:2]
+        scale = imgsz / max(height, width)
+        resized = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR)
+        canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+        top = (imgsz - resized.shape[0]) // 2
+        left = (imgsz - resized.shape[1]) // 2
+        canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+        yield np.ascontiguousarray(canvas[:, :, ::-1].transpose(2, 0, 1))[None].astype(np.float32) / 255.0
+
+
+def _export_onnx_int8(model_path: str, imgsz: int, calib_dir: str | None) -> str:
+    """
+    Quantize the ONNX export to INT8 (QDQ) with static calibration on chart images.
+
+    onnxruntime runs the QDQ model with INT8 kernels on CPUs with VNNI/AVX-512
+    and on GPUs through its TensorRT/CUDA providers.
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    paths = _calibration_images(calib_dir)
+    target = exported_path(model_path, 'onnx-int8')
+    settings = {'imgsz': imgsz, 'calib_dir': os.path.abspath(calib_dir), 'calib_images': len(paths)}
+    if is_export_fresh(model_path, target, settings):
+        return target
+
+    fp32_path = export_model(model_path, 'onnx', imgsz=imgsz, half=False)
+
+    class ChartCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self._batches = _calibration_batches(paths, imgsz)
+
+        def get_next(self):
+            batch = next(self._batches, None)
+            return None if batch is None else {'images': batch}
+
+    quantize_static(
+        fp32_path,
+        target,
+        ChartCalibrationReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    with open(_settings_path(target), 'w') as f:
+        json.dump(settings, f)
+    return target
+
@@ -6,23 +6,53 @@ models used for graph analysis.
 """
 
 import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+import numpy as np
 
 from bar_graph_analyzer import BarGraphAnalyzer
-from config import MODEL_PATH, CLASS_NAMES, TESSERACT_CMD
+from config import (
+    MODEL_PATH, CLASS_NAMES, TESSERACT_CMD, MODEL_FORMAT, MODEL_IMGSZ, MODEL_HALF,
+    MODEL_TRT_WORKSPACE, MODEL_CONF, MODEL_CALIB_DIR, MODEL_COMPILE,
+    INFERENCE_MAX_BATCH, INFERENCE_MAX_WAIT_MS, INFERENCE_TIMEOUT, MODEL_WARMUP_RUNS, MODEL_KEEPALIVE,
+    MAX_SESSIONS, SESSION_TTL, SESSION_HEADER, UPLOAD_DIR, RESULT_CACHE_SIZE,
+)
+from inference_worker import InferenceWorker
+from model_export import export_model, find_fresh_export, supported_batch
+
+
+class SessionNotFoundError(KeyError):
+    """Raised when a request names an analysis session that does not exist or has expired."""
+
+
+class SessionRequiredError(LookupError):
+    """Raised when a request names no analysis session while sessions exist."""
 
 
 class ModelManager:
     """
-    Manages the BarGraphAnalyzer model instance.
+    Manages the BarGraphAnalyzer model instance and per-upload analysis sessions.
     
     This class provides a centralized way to manage the graph analysis
     model, including initialization and access to the analyzer instance.
+    Each upload gets its own session analyzer that shares the loaded model,
+    so concurrent users never overwrite each other's detections or edits.
     """
     
     def __init__(self):
         """Initialize the ModelManager with a BarGraphAnalyzer instance."""
         self.analyzer = None
         self._init_error: str | None = None
+        # session_id -> (analyzer, last access time), least recently used first
+        self._sessions: "OrderedDict[str, Tuple[BarGraphAnalyzer, float]]" = OrderedDict()
+        # upload name -> analyzer snapshot, least recently used first
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sessions_lock = threading.Lock()
+        self._keepalive_pid: int | None = None
         self._initialize_analyzer()
 
     @property
@@ -34,8 +64,9 @@ class ModelManager:
         """
         Initialize the BarGraphAnalyzer with configured parameters.
         
-        Creates a new BarGraphAnalyzer instance using the model path,
-        class names, and tesseract command from configuration.
+        Creates a new BarGraphAnalyzer instance using the model path (or its
+        exported counterpart for MODEL_FORMAT), class names, and tesseract
+        command from configuration.
         """
         if not os.path.isfile(MODEL_PATH):
             self._init_error = (
@@ -46,30 +77,238 @@ class ModelManager:
             print(f"Failed to initialize BarGraphAnalyzer: {self._init_error}")
             return
         try:
+            model_path = self._resolve_weights()
             self.analyzer = BarGraphAnalyzer(
-                model_path=MODEL_PATH,
+                model_path=model_path,
                 class_names=CLASS_NAMES,
-                pytesseract_cmd=TESSERACT_CMD
+                pytesseract_cmd=TESSERACT_CMD,
+                imgsz=MODEL_IMGSZ,
+                conf_threshold=MODEL_CONF,
+                compile_mode=MODEL_COMPILE,
+                half=MODEL_HALF,
+            )
+            self.analyzer.inference_worker = InferenceWorker(
+                self.analyzer.predict_batch,
+                max_batch=supported_batch(model_path, INFERENCE_MAX_BATCH),
+                max_wait_ms=INFERENCE_MAX_WAIT_MS,
             )
+            self.analyzer.inference_timeout = INFERENCE_TIMEOUT
         except Exception as e:
             self._init_error = str(e)
             print(f"Failed to initialize BarGraphAnalyzer: {e}")
             self.analyzer = None
     
-    def get_analyzer(self) -> BarGraphAnalyzer:
+    def _resolve_weights(self) -> str:
+        """
+        Get the weights file the analyzer should load for MODEL_FORMAT.
+        
+        Non-PyTorch formats are exported from MODEL_PATH on first use and
+        cached; if the export fails the PyTorch weights are used instead.
+        "auto" loads an already exported, up-to-date sibling of MODEL_PATH
+        (TensorRT on CUDA, else ONNX) without exporting anything.
+        
+        Returns:
+            str: Path to the weights file to load
+        """
+        if MODEL_FORMAT == 'auto':
+            return find_fresh_export(MODEL_PATH, MODEL_IMGSZ) or MODEL_PATH
+        if MODEL_FORMAT == 'pt':
+            return MODEL_PATH
+        try:
+            return export_model(
+                MODEL_PATH, MODEL_FORMAT,
+                imgsz=MODEL_IMGSZ, half=MODEL_HALF, workspace=MODEL_TRT_WORKSPACE,
+                calib_dir=MODEL_CALIB_DIR,
+            )
+        except Exception as e:
+            print(f"Export to {MODEL_FORMAT} failed, falling back to {MODEL_PATH}: {e}")
+            return MODEL_PATH
+    
+    def _dummy_image(self):
+        """Blank BGR image at the detector's inference size."""
+        return np.zeros((MODEL_IMGSZ, MODEL_IMGSZ, 3), dtype=np.uint8)
+    
+    def warmup(self, runs: int = MODEL_WARMUP_RUNS) -> None:
+        """
+        Run dummy forward passes so the first real upload sees steady-state latency.
+        
+        The first calls pay for CUDA context creation, cuDNN autotuning and
+        TensorRT lazy initialization; doing them before serving keeps that
+        cost out of user requests. Each run does a single image and, when the
+        inference worker batches, a full batch, since cuDNN tunes per shape.
+        Failures are reported but not raised.
+        
+        Args:
+            runs (int): Number of dummy forward passes
+        """
+        if self.analyzer is None or runs <= 0:
+            return
+        dummy = self._dummy_image()
+        worker = self.analyzer.inference_worker
+        batches = [[dummy]]
+        if worker is not None and worker.max_batch > 1:
+            batches.append([dummy] * worker.max_batch)
+        start = time.perf_counter()
+        try:
+            for _ in range(runs):
+                for batch in batches:
+                    self.analyzer.predict_batch(batch)
+        except Exception as e:
+            print(f"Model warmup failed: {e}")
+            return
+        print(f"Model warmed up in {time.perf_counter() - start:.2f}s ({runs} runs)")
+    
+    def start_keepalive(self, interval: float = MODEL_KEEPALIVE) -> None:
+        """
+        Start a daemon thread that runs a dummy inference every `interval` seconds.
+        
+        Keeps the GPU clocks and CUDA context from going cold between sparse
+        requests. The dummy goes through the inference worker, so it never
+        runs concurrently with a real forward pass. Threads do not survive
+        fork, so call this in each serving process (gunicorn: post_fork).
+        
+        Args:
+            interval (float): Seconds between dummy inferences; <= 0 disables it
+        """
+        if self.analyzer is None or interval <= 0 or self._keepalive_pid == os.getpid():
+            return
+        self._keepalive_pid = os.getpid()
+        threading.Thread(
+            target=self._keepalive_loop,
+            args=(interval,),
+            name="model-keepalive",
+            daemon=True,
+        ).start()
+    
+    def _keepalive_loop(self, interval: float) -> None:
+        """Keepalive thread body: periodic dummy inference through the worker."""
+        dummy = self._dummy_image()
+        while True:
+            time.sleep(interval)
+            try:
+                self.analyzer.inference_worker.submit(dummy).result(timeout=INFERENCE_TIMEOUT)
+            except Exception as e:
+                print(f"Model keepalive inference failed: {e}")
+    
+    def get_analyzer(self, session_id: str | None = None) -> BarGraphAnalyzer:
         """
-        Get the current BarGraphAnalyzer instance.
+        Get the BarGraphAnalyzer for an analysis session.
+        
+        Without a session id the base analyzer (no image) is returned while
+        nothing has been uploaded; once sessions exist a session id is
+        required, so a client can never read or edit another user's upload.
         
+        Args:
+            session_id (str | None): Session id returned by create_session
+            
         Returns:
             BarGraphAnalyzer: The initialized analyzer instance
             
+        Raises:
+            RuntimeError: If the analyzer failed to initialize
+            SessionNotFoundError: If session_id is unknown or has expired
+            SessionRequiredError: If session_id is missing while sessions exist
+        """
+        self._require_ready()
+        with self._sessions_lock:
+            self._evict_expired()
+            if session_id is None:
+                if not self._sessions:
+                    return self.analyzer
+                raise SessionRequiredError(SESSION_HEADER)
+            if session_id not in self._sessions:
+                raise SessionNotFoundError(session_id)
+            analyzer, _ = self._sessions[session_id]
+            self._sessions[session_id] = (analyzer, time.monotonic())
+            self._sessions.move_to_end(session_id)
+            return analyzer
+    
+    def create_session(self, upload_name: str | None = None) -> Tuple[str, BarGraphAnalyzer]:
+        """
+        Start a new analysis session with fresh per-image state.
+        
+        Args:
+            upload_name (str | None): Content-addressed upload file the session shows
+            
+        Returns:
+            Tuple[str, BarGraphAnalyzer]: New session id and its analyzer
+            
         Raises:
             RuntimeError: If the analyzer failed to initialize
         """
+        self._require_ready()
+        session_id = uuid.uuid4().hex
+        analyzer = self.analyzer.spawn()
+        analyzer.upload_name = upload_name
+        with self._sessions_lock:
+            self._sessions[session_id] = (analyzer, time.monotonic())
+            while len(self._sessions) > MAX_SESSIONS:
+                _, (evicted, _) = self._sessions.popitem(last=False)
+                self._release_upload(evicted.upload_name)
+        return session_id, analyzer
+    
+    def cached_result(self, upload_name: str) -> Dict[str, Any] | None:
+        """
+        Get the analysis snapshot of an identical earlier upload.
+        
+        Args:
+            upload_name (str): Content-addressed upload file name
+            
+        Returns:
+            Dict[str, Any] | None: Snapshot for BarGraphAnalyzer.restore, or None on a miss
+        """
+        with self._sessions_lock:
+            snapshot = self._results.get(upload_name)
+            if snapshot is not None:
+                self._results.move_to_end(upload_name)
+            return snapshot
+    
+    def store_result(self, upload_name: str, snapshot: Dict[str, Any]) -> None:
+        """
+        Remember the analysis snapshot of an upload for identical re-uploads.
+        
+        Args:
+            upload_name (str): Content-addressed upload file name
+            snapshot (Dict[str, Any]): Value of BarGraphAnalyzer.snapshot() after detection
+        """
+        with self._sessions_lock:
+            self._results[upload_name] = snapshot
+            self._results.move_to_end(upload_name)
+            while len(self._results) > RESULT_CACHE_SIZE:
+                evicted_name, _ = self._results.popitem(last=False)
+                self._release_upload(evicted_name)
+    
+    def _require_ready(self) -> None:
+        """Raise RuntimeError if the base analyzer failed to initialize."""
         if self.analyzer is None:
             detail = f": {self._init_error}" if self._init_error else ""
             raise RuntimeError(f"BarGraphAnalyzer not initialized{detail}")
-        return self.analyzer
+    
+    def _evict_expired(self) -> None:
+        """Drop sessions idle for longer than SESSION_TTL (caller holds the sessions lock)."""
+        cutoff = time.monotonic() - SESSION_TTL
+        while self._sessions:
+            oldest_id, (_, last_used) = next(iter(self._sessions.items()))
+            if last_used >= cutoff:
+                break
+            analyzer, _ = self._sessions.pop(oldest_id)
+            self._release_upload(analyzer.upload_name)
+    
+    def _release_upload(self, upload_name: str | None) -> None:
+        """
+        Delete an upload file once no session or cached result refers to it.
+        
+        Identical uploads share one file, so it is only removed when its last
+        user is evicted (caller holds the sessions lock).
+        """
+        if not upload_name or upload_name in self._results:
+            return
+        if any(analyzer.upload_name == upload_name for analyzer, _ in self._sessions.values()):
+            return
+        try:
+            os.remove(os.path.join(UPLOAD_DIR, upload_name))
+        except FileNotFoundError:
+            pass
     
     def is_ready(self) -> bool:
         """
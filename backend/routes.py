@@ -6,12 +6,50 @@ including file upload, analysis, and value updates.
 """
 
 from flask import request, jsonify, send_from_directory
-from typing import Dict, Any, Tuple
+from typing import Callable, Dict, Any, Tuple
+import functools
+import hashlib
+import logging
 import os
+import threading
 
-from model_manager import model_manager
-from file_utils import get_secure_filename, clear_upload_folder
-from config import UPLOAD_DIR
+from bar_graph_analyzer import BarGraphAnalyzer
+from model_manager import model_manager, SessionNotFoundError, SessionRequiredError
+from file_utils import get_secure_filename, write_file
+from vision_utils import decode_image
+from config import UPLOAD_DIR, SESSION_HEADER, UPLOAD_CACHE_MAX_AGE
+
+log = logging.getLogger(__name__)
+
+
+def session_handler(handler: Callable[..., Tuple[Dict[str, Any], int]]) -> Callable[..., Tuple[Dict[str, Any], int]]:
+    """
+    Run a route handler against the analysis session named by the request.
+    
+    The session id is read from the X-Session-Id header (returned by
+    /api/bar_analyzer) and is required once any upload exists. The
+    session's analyzer is passed as the handler's first argument and its
+    lock is held for the duration of the handler.
+    
+    Args:
+        handler: Route handler taking the session analyzer as first argument
+        
+    Returns:
+        Flask view function without the analyzer argument
+    """
+    @functools.wraps(handler)
+    def view(*args, **kwargs):
+        try:
+            analyzer = model_manager.get_analyzer(request.headers.get(SESSION_HEADER))
+        except SessionNotFoundError:
+            return {'error': 'Unknown or expired session. Please upload the image again.'}, 404
+        except SessionRequiredError:
+            return {'error': f'Missing {SESSION_HEADER} header. Send the session_id returned by the upload.'}, 400
+        
+        with analyzer.lock:
+            return handler(analyzer, *args, **kwargs)
+    
+    return view
 
 
 def handle_bar_analyzer() -> Tuple[Dict[str, Any], int]:
@@ -26,10 +64,11 @@ def handle_bar_analyzer() -> Tuple[Dict[str, Any], int]:
         
     Example Response:
         {
+            "session_id": "3f2b...",
             "filename": "image.png",
             "detection_boxes": [...],
             "image_shape": [height, width],
-            "image_url": "/static/uploads/image.png",
+            "image_url": "/static/uploads/9c1e....png",
             "origin_value": 0,
             "ymax_value": 25
         }
@@ -44,47 +83,63 @@ def handle_bar_analyzer() -> Tuple[Dict[str, Any], int]:
     if not filename:
         return {'error': 'Invalid or missing file'}, 400
     
-    try:
-        # Get analyzer instance
-        analyzer = model_manager.get_analyzer()
-        
-        # Save uploaded file
-        filepath = os.path.join(UPLOAD_DIR, filename)
-        clear_upload_folder(UPLOAD_DIR)
-        file.save(filepath)
-        
-        # Process image with analyzer
-        analyzer.detect_box(filepath)
-        
-        # Validate image processing
-        if analyzer.image is None:
+    # Name the stored copy by content: identical uploads share one file and
+    # one cached analysis, and the immutable image URL stays valid across them
+    raw = file.read()
+    _, _, extension = filename.rpartition('.')
+    upload_name = f"{hashlib.blake2b(raw, digest_size=16).hexdigest()}.{extension.lower()}"
+    cached = model_manager.cached_result(upload_name)
+    
+    # Decode the upload in memory unless an identical upload was analyzed already
+    image = None
+    if cached is None:
+        image = decode_image(raw)
+        if image is None:
             return {'error': 'Failed to process image'}, 400
+    
+    # Each upload gets its own session analyzer; the copy served at
+    # image_url is written on a background thread while detection runs
+    session_id, analyzer = model_manager.create_session(upload_name)
+    filepath = os.path.join(UPLOAD_DIR, upload_name)
+    writer = None
+    if not os.path.isfile(filepath):
+        writer = threading.Thread(target=write_file, args=(filepath, raw), daemon=True)
+        writer.start()
+    
+    # Process image with analyzer, or replay the cached analysis
+    with analyzer.lock:
+        try:
+            if cached is not None:
+                analyzer.restore(cached)
+            else:
+                analyzer.detect_box_array(image)
+                model_manager.store_result(upload_name, analyzer.snapshot())
+        finally:
+            if writer is not None:
+                writer.join()
         
         # Get component status
         component_status = analyzer.get_component_status()
-        
-        # Prepare response
-        response_data = {
-            'filename': filename,
-            'detection_boxes': analyzer.detections,
-            'image_shape': list(analyzer.image.shape[:2]),
-            'image_url': f'/static/uploads/{filename}',
-            'origin_value': analyzer.origin_value,
-            'ymax_value': analyzer.ymax_value,
-            'origin_conversion_error': analyzer.origin_conversion_error,
-            'ymax_conversion_error': analyzer.ymax_conversion_error,
-            'component_status': component_status
-        }
-        
-        return response_data, 200
-        
-    except ValueError as e:
-        return {'error': str(e)}, 400
-    except Exception as e:
-        return {'error': f'Internal server error: {str(e)}'}, 500
+    
+    # Prepare response
+    response_data = {
+        'session_id': session_id,
+        'filename': filename,
+        'detection_boxes': analyzer.detections,
+        'image_shape': list(analyzer.image.shape[:2]),
+        'image_url': f'/static/uploads/{upload_name}',
+        'origin_value': analyzer.origin_value,
+        'ymax_value': analyzer.ymax_value,
+        'origin_conversion_error': analyzer.origin_conversion_error,
+        'ymax_conversion_error': analyzer.ymax_conversion_error,
+        'component_status': component_status
+    }
+    
+    return response_data, 200
 
 
-def handle_update_values() -> Tuple[Dict[str, Any], int]:
+@session_handler
+def handle_update_values(analyzer: BarGraphAnalyzer) -> Tuple[Dict[str, Any], int]:
     """
     Handle requests to update origin and ymax values.
     
@@ -107,37 +162,33 @@ def handle_update_values() -> Tuple[Dict[str, Any], int]:
             "ymax_value": 25
         }
     """
-    try:
-        data = request.get_json()
-        if not data:
-            return {'error': 'No JSON data provided'}, 400
-            
-        origin_value = data.get('origin_value')
-        ymax_value = data.get('ymax_value')
-        
-        if origin_value is None or ymax_value is None:
-            return {'error': 'Both origin_value and ymax_value are required'}, 400
-            
-        # Get analyzer instance and update values
-        analyzer = model_manager.get_analyzer()
-        analyzer.origin_value = origin_value
-        analyzer.ymax_value = ymax_value
-        
-        # Get updated component status after value update
-        component_status = analyzer.get_component_status()
+    data = request.get_json()
+    if not data:
+        return {'error': 'No JSON data provided'}, 400
         
-        return {
-            'success': True,
-            'origin_value': analyzer.origin_value,
-            'ymax_value': analyzer.ymax_value,
-            'component_status': component_status
-        }, 200
+    origin_value = data.get('origin_value')
+    ymax_value = data.get('ymax_value')
+    
+    if origin_value is None or ymax_value is None:
+        return {'error': 'Both origin_value and ymax_value are required'}, 400
         
-    except Exception as e:
-        return {'error': f'Failed to update values: {str(e)}'}, 500
+    # Update values
+    analyzer.origin_value = origin_value
+    analyzer.ymax_value = ymax_value
+    
+    # Get updated component status after value update
+    component_status = analyzer.get_component_status()
+    
+    return {
+        'success': True,
+        'origin_value': analyzer.origin_value,
+        'ymax_value': analyzer.ymax_value,
+        'component_status': component_status
+    }, 200
 
 
-def handle_update_box_coordinates() -> Tuple[Dict[str, Any], int]:
+@session_handler
+def handle_update_box_coordinates(analyzer: BarGraphAnalyzer) -> Tuple[Dict[str, Any], int]:
     """
     Handle requests to update box coordinates when moved on the frontend.
     
@@ -162,54 +213,46 @@ def handle_update_box_coordinates() -> Tuple[Dict[str, Any], int]:
             "message": "Box coordinates updated successfully"
         }
     """
-    try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['box_id', 'x1', 'y1', 'x2', 'y2']
-        for field in required_fields:
-            if field not in data:
-                return {'error': f'Missing required field: {field}'}, 400
-        
-        box_id = data['box_id']
-        x1 = float(data['x1'])
-        y1 = float(data['y1'])
-        x2 = float(data['x2'])
-        y2 = float(data['y2'])
-        
-        # Validate coordinate values
-        if x1 >= x2 or y1 >= y2:
-            return {'error': 'Invalid coordinates: x1 must be < x2 and y1 must be < y2'}, 400
-        
-        # Get analyzer instance and update coordinates
-        analyzer = model_manager.get_analyzer()
-        success = analyzer.update_box_coordinates(box_id, x1, y1, x2, y2)
-        
-        if success:
-            # Get updated component status after coordinate update
-            component_status = analyzer.get_component_status()
-            
-            # Get updated detection boxes
-            updated_detections = []
-            for category_dict in analyzer._category_dicts:
-                updated_detections.extend(category_dict.values())
-            
-            return {
-                'success': True, 
-                'message': 'Box coordinates updated successfully',
-                'component_status': component_status,
-                'detection_boxes': updated_detections
-            }, 200
-        else:
-            return {'error': f'Box with ID {box_id} not found'}, 404
-            
-    except ValueError as e:
-        return {'error': f'Invalid coordinates: {str(e)}'}, 400
-    except Exception as e:
-        return {'error': f'Failed to update box coordinates: {str(e)}'}, 500
+    data = request.get_json()
+    
+    # Validate required fields
+    required_fields = ['box_id', 'x1', 'y1', 'x2', 'y2']
+    for field in required_fields:
+        if field not in data:
+            return {'error': f'Missing required field: {field}'}, 400
+    
+    box_id = data['box_id']
+    x1 = float(data['x1'])
+    y1 = float(data['y1'])
+    x2 = float(data['x2'])
+    y2 = float(data['y2'])
+    
+    # Validate coordinate values
+    if x1 >= x2 or y1 >= y2:
+        return {'error': 'Invalid coordinates: x1 must be < x2 and y1 must be < y2'}, 400
+    
+    # Update coordinates
+    success = analyzer.update_box_coordinates(box_id, x1, y1, x2, y2)
+    
+    if success:
+        # Get updated component status after coordinate update
+        component_status = analyzer.get_component_status()
+        
+        # Get updated detection boxes
+        updated_detections = analyzer.get_detection_boxes()
+        
+        return {
+            'success': True, 
+            'message': 'Box coordinates updated successfully',
+            'component_status': component_status,
+            'detection_boxes': updated_detections
+        }, 200
+    else:
+        return {'error': f'Box with ID {box_id} not found'}, 404
 
 
-def handle_calculate_heights() -> Tuple[Dict[str, Any], int]:
+@session_handler
+def handle_calculate_heights(analyzer: BarGraphAnalyzer) -> Tuple[Dict[str, Any], int]:
     """
     Handle requests to calculate bar and uptail heights.
     
@@ -231,33 +274,25 @@ def handle_calculate_heights() -> Tuple[Dict[str, Any], int]:
             }
         }
     """
-    try:
-        # Get analyzer instance
-        analyzer = model_manager.get_analyzer()
-        
-        # Check if image has been processed
-        if analyzer.image is None:
-            return {'error': 'No image has been processed yet. Please upload and analyze an image first.'}, 400
-        
-        # Check if detections exist
-        if not analyzer.detections:
-            return {'error': 'No detections found. Please ensure the image has been analyzed.'}, 400
-        
-        # Calculate heights
-        results = analyzer.calculate_heights()
-        
-        return {
-            'success': True,
-            'results': results
-        }, 200
-        
-    except ValueError as e:
-        return {'error': f'Calculation error: {str(e)}'}, 400
-    except Exception as e:
-        return {'error': f'Failed to calculate heights: {str(e)}'}, 500
+    # Check if image has been processed
+    if analyzer.image is None:
+        return {'error': 'No image has been processed yet. Please upload and analyze an image first.'}, 400
+    
+    # Check if detections exist
+    if not analyzer.detections:
+        return {'error': 'No detections found. Please ensure the image has been analyzed.'}, 400
+    
+    # Calculate heights
+    results = analyzer.calculate_heights()
+    
+    return {
+        'success': True,
+        'results': results
+    }, 200
 
 
-def handle_update_bar_names() -> Tuple[Dict[str, Any], int]:
+@session_handler
+def handle_update_bar_names(analyzer: BarGraphAnalyzer) -> Tuple[Dict[str, Any], int]:
     """
     Handle requests to update bar names.
     
@@ -277,33 +312,29 @@ def handle_update_bar_names() -> Tuple[Dict[str, Any], int]:
             "message": "Bar names updated successfully"
         }
     """
-    try:
-        data = request.get_json()
-        if not data:
-            return {'error': 'No JSON data provided'}, 400
-            
-        bar_names = data.get('bar_names')
-        if not bar_names or not isinstance(bar_names, list):
-            return {'error': 'bar_names must be a list'}, 400
-            
-        # Get analyzer instance and update bar names
-        analyzer = model_manager.get_analyzer()
-        success = analyzer.update_bar_names(bar_names)
-        
-        if success:
-            return {
-                'success': True, 
-                'message': 'Bar names updated successfully',
-                'bar_names': bar_names
-            }, 200
-        else:
-            return {'error': 'Failed to update bar names. Number of names must match number of bars.'}, 400
-        
-    except Exception as e:
-        return {'error': f'Failed to update bar names: {str(e)}'}, 500
+    data = request.get_json()
+    if not data:
+        return {'error': 'No JSON data provided'}, 400
+        
+    bar_names = data.get('bar_names')
+    if not bar_names or not isinstance(bar_names, list):
+        return {'error': 'bar_names must be a list'}, 400
+        
+    # Update bar names
+    success = analyzer.update_bar_names(bar_names)
+    
+    if success:
+        return {
+            'success': True, 
+            'message': 'Bar names updated successfully',
+            'bar_names': bar_names
+        }, 200
+    else:
+        return {'error': 'Failed to update bar names. Number of names must match number of bars.'}, 400
 
 
-def handle_update_box_category() -> Tuple[Dict[str, Any], int]:
+@session_handler
+def handle_update_box_category(analyzer: BarGraphAnalyzer) -> Tuple[Dict[str, Any], int]:
     """
     Handle requests to update the category of a detection box.
     
@@ -326,56 +357,45 @@ def handle_update_box_category() -> Tuple[Dict[str, Any], int]:
             "new_category": "uptail"
         }
     """
-    try:
-        data = request.get_json()
-        if not data:
-            return {'error': 'No JSON data provided'}, 400
-            
-        box_id = data.get('box_id')
-        new_category = data.get('new_category')
-        
-        if not box_id or not new_category:
-            return {'error': 'Both box_id and new_category are required'}, 400
-            
-        # Validate category
-        valid_categories = ['bar', 'uptail', 'yaxis', 'xaxis', 'ymax', 'origin', 'label', 'x_group', 'legend', 'legend_group']
-        if new_category not in valid_categories:
-            return {'error': f'Invalid category. Must be one of: {", ".join(valid_categories)}'}, 400
-            
-        # Get analyzer instance and update box category
-        analyzer = model_manager.get_analyzer()
-        print(f"DEBUG: Attempting to change box {box_id} to category {new_category}")
-        print(f"DEBUG: Available detections: {len(analyzer.detections) if analyzer.detections else 0}")
-        success = analyzer.change_box_category(box_id, new_category)
-        
-        if success:
-            # Get updated component status
-            component_status = analyzer.get_component_status()
-            
-            # Get updated detection boxes
-            updated_detections = []
-            for category_dict in analyzer._category_dicts:
-                updated_detections.extend(category_dict.values())
-            
-            print(f"DEBUG: Returning {len(updated_detections)} updated detection boxes")
-            for det in updated_detections[:3]:  # Log first 3 for debugging
-                print(f"DEBUG: Box {det.get('id', 'no_id')} -> {det.get('label', 'no_label')}")
-            
-            return {
-                'success': True,
-                'message': 'Box category updated successfully',
-                'new_category': new_category,
-                'component_status': component_status,
-                'detection_boxes': updated_detections
-            }, 200
-        else:
-            return {'error': 'Failed to update box category. Box not found or invalid operation.'}, 400
-        
-    except Exception as e:
-        return {'error': f'Failed to update box category: {str(e)}'}, 500
+    data = request.get_json()
+    if not data:
+        return {'error': 'No JSON data provided'}, 400
+        
+    box_id = data.get('box_id')
+    new_category = data.get('new_category')
+    
+    if not box_id or not new_category:
+        return {'error': 'Both box_id and new_category are required'}, 400
+        
+    # Validate category
+    valid_categories = ['bar', 'uptail', 'yaxis', 'xaxis', 'ymax', 'origin', 'label', 'x_group', 'legend', 'legend_group']
+    if new_category not in valid_categories:
+        return {'error': f'Invalid category. Must be one of: {", ".join(valid_categories)}'}, 400
+        
+    # Update box category
+    log.debug("Changing box %s to category %s", box_id, new_category)
+    success = analyzer.change_box_category(box_id, new_category)
+    
+    if success:
+        # Get updated component status
+        component_status = analyzer.get_component_status()
+        
+        # Get updated detection boxes
+        updated_detections = analyzer.get_detection_boxes()
+        
+        return {
+            'success': True,
+            'message': 'Box category updated successfully',
+            'new_category': new_category,
+            'component_status': component_status,
+            'detection_boxes': updated_detections
+        }, 200
+    else:
+        return {'error': 'Failed to update box category. Box not found or invalid operation.'}, 400
 
 
-def handle_add_new_box() -> Tuple[Dict[str, Any], int]:
+@session_handler
+def handle_add_new_box(analyzer: BarGraphAnalyzer) -> Tuple[Dict[str, Any], int]:
     """
     Handle requests to add a new detection box.
     
@@ -402,71 +422,63 @@ def handle_add_new_box() -> Tuple[Dict[str, Any], int]:
             "detection_boxes": [...]
         }
     """
-    try:
-        data = request.get_json()
-        if not data:
-            return {'error': 'No JSON data provided'}, 400
-            
-        # Extract box data
-        x1 = data.get('x1')
-        y1 = data.get('y1')
-        x2 = data.get('x2')
-        y2 = data.get('y2')
-        label = data.get('label')
-        
-        if any(v is None for v in [x1, y1, x2, y2, label]):
-            return {'error': 'All coordinates (x1, y1, x2, y2) and label are required'}, 400
-            
-        # Validate coordinates
-        if x1 >= x2 or y1 >= y2:
-            return {'error': 'Invalid coordinates: x1 must be < x2 and y1 must be < y2'}, 400
-            
-        # Validate label
-        valid_categories = ['bar', 'uptail', 'yaxis', 'xaxis', 'ymax', 'origin', 'label', 'x_group', 'legend', 'legend_group']
-        if label not in valid_categories:
-            return {'error': f'Invalid label. Must be one of: {", ".join(valid_categories)}'}, 400
-            
-        # Get analyzer instance and add new box
-        analyzer = model_manager.get_analyzer()
-        print(f"DEBUG: Adding new box with label {label} at coordinates ({x1}, {y1}, {x2}, {y2})")
-        
-        box_data = {
-            'x1': float(x1),
-            'y1': float(y1),
-            'x2': float(x2),
-            'y2': float(y2),
-            'label': label,
-            'conf': 1.0,  # Default confidence for manually added boxes
-            'class': 0     # Default class index
-        }
+    data = request.get_json()
+    if not data:
+        return {'error': 'No JSON data provided'}, 400
+        
+    # Extract box data
+    x1 = data.get('x1')
+    y1 = data.get('y1')
+    x2 = data.get('x2')
+    y2 = data.get('y2')
+    label = data.get('label')
+    
+    if any(v is None for v in [x1, y1, x2, y2, label]):
+        return {'error': 'All coordinates (x1, y1, x2, y2) and label are required'}, 400
+        
+    # Validate coordinates
+    if x1 >= x2 or y1 >= y2:
+        return {'error': 'Invalid coordinates: x1 must be < x2 and y1 must be < y2'}, 400
         
-        new_box_id = analyzer.add_new_box(box_data)
-        
-        if new_box_id:
-            # Get updated detection boxes and component status
-            updated_detections = []
-            for category_dict in analyzer._category_dicts:
-                updated_detections.extend(category_dict.values())
-            
-            component_status = analyzer.get_component_status()
-            
-            print(f"DEBUG: Successfully added box {new_box_id}, returning {len(updated_detections)} total boxes")
-            
-            return {
-                'success': True,
-                'message': 'New box added successfully',
-                'box_id': new_box_id,
-                'detection_boxes': updated_detections,
-                'component_status': component_status
-            }, 200
-        else:
-            return {'error': 'Failed to add new box'}, 400
-        
-    except Exception as e:
-        return {'error': f'Failed to add new box: {str(e)}'}, 500
+    # Validate label
+    valid_categories = ['bar', 'uptail', 'yaxis', 'xaxis', 'ymax', 'origin', 'label', 'x_group', 'legend', 'legend_group']
+    if label not in valid_categories:
+        return {'error': f'Invalid label. Must be one of: {", ".join(valid_categories)}'}, 400
+        
+    # Add new box
+    log.debug("Adding %s box at (%s, %s, %s, %s)", label, x1, y1, x2, y2)
+    
+    box_data = {
+        'x1': float(x1),
+        'y1': float(y1),
+        'x2': float(x2),
+        'y2': float(y2),
+        'label': label,
+        'conf': 1.0,  # Default confidence for manually added boxes
+        'class': 0     # Default class index
+    }
+    
+    new_box_id = analyzer.add_new_box(box_data)
+    
+    if new_box_id:
+        # Get updated detection boxes and component status
+        updated_detections = analyzer.get_detection_boxes()
+        
+        component_status = analyzer.get_component_status()
+        
+        return {
+            'success': True,
+            'message': 'New box added successfully',
+            'box_id': new_box_id,
+            'detection_boxes': updated_detections,
+            'component_status': component_status
+        }, 200
+    else:
+        return {'error': 'Failed to add new box'}, 400
 
 
-def handle_remove_box() -> Tuple[Dict[str, Any], int]:
+@session_handler
+def handle_remove_box(analyzer: BarGraphAnalyzer) -> Tuple[Dict[str, Any], int]:
     """
     Handle requests to remove a detection box.
     
@@ -488,52 +500,49 @@ def handle_remove_box() -> Tuple[Dict[str, Any], int]:
             "detection_boxes": [...]
         }
     """
-    try:
-        data = request.get_json()
-        if not data:
-            return {'error': 'No JSON data provided'}, 400
-            
-        box_id = data.get('box_id')
-        if not box_id:
-            return {'error': 'box_id is required'}, 400
-            
-        # Get analyzer instance and remove the box
-        analyzer = model_manager.get_analyzer()
-        print(f"DEBUG: Attempting to remove box {box_id}")
-        
-        success = analyzer.remove_box(box_id)
-        
-        if success:
-            # Get updated detection boxes and component status
-            updated_detections = []
-            for category_dict in analyzer._category_dicts:
-                updated_detections.extend(category_dict.values())
-            
-            component_status = analyzer.get_component_status()
-            
-            print(f"DEBUG: Successfully removed box {box_id}, returning {len(updated_detections)} total boxes")
-            
-            return {
-                'success': True,
-                'message': 'Box removed successfully',
-                'detection_boxes': updated_detections,
-                'component_status': component_status
-            }, 200
-        else:
-            return {'error': 'Failed to remove box. Box not found.'}, 400
-        
-    except Exception as e:
-        return {'error': f'Failed to remove box: {str(e)}'}, 500
+    data = request.get_json()
+    if not data:
+        return {'error': 'No JSON data provided'}, 400
+        
+    box_id = data.get('box_id')
+    if not box_id:
+        return {'error': 'box_id is required'}, 400
+        
+    # Remove the box
+    log.debug("Removing box %s", box_id)
+    
+    success = analyzer.remove_box(box_id)
+    
+    if success:
+        # Get updated detection boxes and component status
+        updated_detections = analyzer.get_detection_boxes()
+        
+        component_status = analyzer.get_component_status()
+        
+        return {
+            'success': True,
+            'message': 'Box removed successfully',
+            'detection_boxes': updated_detections,
+            'component_status': component_status
+        }, 200
+    else:
+        return {'error': 'Failed to remove box. Box not found.'}, 400
 
 
 def handle_uploaded_file(filename: str) -> Any:
     """
     Serve uploaded files from the uploads directory.
     
+    Uploads are named by a hash of their content and never rewritten, so
+    browsers may cache them indefinitely; conditional requests are
+    answered with 304 Not Modified.
+    
     Args:
-        filename (str): Name of the file to serve
+        filename (str): Content-addressed name of the file to serve
         
     Returns:
         Flask response: The requested file or 404 error
     """
-    return send_from_directory(UPLOAD_DIR, filename) 
\ No newline at end of file
+    response = send_from_directory(UPLOAD_DIR, filename, conditional=True, max_age=UPLOAD_CACHE_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={UPLOAD_CACHE_MAX_AGE}, immutable'
+    return response 
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""Tests for the OCR preprocessing helpers in vision_utils."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("pytesseract")
+
+from vision_utils import binary_for_digits, to_binary  # noqa: E402
+
+
+def test_to_binary_tall_narrow_crop_caps_height():
+    crop = np.full((400, 1, 3), 255, dtype=np.uint8)
+    binary = to_binary(crop, width=500, max_height=160)
+    assert binary.shape == (160, 1)
+
+
+def test_to_binary_wide_flat_crop_keeps_one_row():
+    crop = np.full((1, 2000, 3), 255, dtype=np.uint8)
+    binary = to_binary(crop, width=500, max_height=160)
+    assert binary.shape == (1, 500)
+
+
+def test_binary_for_digits_tall_narrow_crop():
+    crop = np.zeros((400, 1, 3), dtype=np.uint8)
+    assert binary_for_digits(crop, width=500, max_height=160).shape == (160, 1)
@@ -6,12 +6,230 @@ This module groups reusable computer-vision helpers used by analyzers.
 
 from __future__ import annotations
 
-from typing import Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+import functools
+import hashlib
+import os
+import re
+import subprocess
+import tempfile
+import threading
+
+# config first: it caps native thread pools before cv2/numpy load
+from config import CV_NUM_THREADS, OCR_BATCH, OCR_CACHE_SIZE, OCR_MAX_HEIGHT, OCR_WORKERS
 import cv2
-import imutils
 import pytesseract
 import numpy as np
 
+try:
+    import tesserocr
+except ImportError:  # optional: fall back to the pytesseract subprocess per call
+    tesserocr = None
+
+try:
+    from turbojpeg import TJPF_BGR, TurboJPEG
+except ImportError:  # optional: JPEGs are decoded by OpenCV
+    TurboJPEG = None
+
+cv2.setNumThreads(CV_NUM_THREADS)
+
+# Process-wide OCR memo keyed by a digest of the crop's pixels (OCR_CACHE_SIZE entries)
+_ocr_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_ocr_cache_lock = threading.Lock()
+
+# Shared OCR pool (OCR_WORKERS threads), recreated after fork
+_ocr_pool: ThreadPoolExecutor | None = None
+_ocr_pool_pid: int | None = None
+_ocr_pool_lock = threading.Lock()
+
+
+# tesserocr APIs are not thread-safe: each OCR thread keeps its own, keyed by configuration
+_tess_local = threading.local()
+
+
+def _tesserocr_api(psm: int, whitelist: str | None):
+    """Get this thread's in-process Tesseract API for a page segmentation mode and whitelist."""
+    apis = getattr(_tess_local, "apis", None)
+    if apis is None:
+        apis = _tess_local.apis = {}
+    key = (psm, whitelist)
+    if key not in apis:
+        api = tesserocr.PyTessBaseAPI(psm=psm, oem=tesserocr.OEM.DEFAULT)
+        if whitelist:
+            api.SetVariable("tessedit_char_whitelist", whitelist)
+        apis[key] = api
+    return apis[key]
+
+
+def image_to_string(image: np.ndarray, psm: int, whitelist: str | None = None) -> str:
+    """
+    Run Tesseract on a single-channel image.
+
+    With tesserocr installed the language data is loaded once per thread and
+    reused; otherwise the tesseract binary is launched per call.
+
+    Args:
+        image: Single-channel uint8 image.
+        psm: Tesseract page segmentation mode.
+        whitelist: Optional set of characters to restrict recognition to.
+
+    Returns:
+        Recognized text, untrimmed.
+    """
+    if tesserocr is not None:
+        api = _tesserocr_api(psm, whitelist)
+        pixels = np.ascontiguousarray(image)
+        height, width = pixels.shape[:2]
+        api.SetImageBytes(pixels.tobytes(), width, height, 1, width)
+        return api.GetUTF8Text()
+
+    return _tesseract_stdin(image, psm, whitelist)
+
+
+def _tesseract_stdin(image: np.ndarray, psm: int, whitelist: str | None) -> str:
+    """
+    Run the tesseract binary on one image piped through stdin.
+
+    pytesseract saves each image to a temporary PNG and reads the text back
+    from a second file; an uncompressed PGM on stdin with the text on stdout
+    skips the compression and both file system round trips.
+    """
+    ok, encoded = cv2.imencode(".pgm", image)
+    if not ok:
+        return ""  # only an empty crop fails to encode, and it holds no text
+    return _run_tesseract("stdin", psm, whitelist, encoded.tobytes())
+
+
+def _run_tesseract(source: str, psm: int, whitelist: str | None, stdin: bytes | None = None) -> str:
+    """
+    Run the tesseract binary on `source` (a path, list file or "stdin") and return stdout.
+
+    Tesseract's OpenMP threading is slower than single-threaded on small crops
+    and oversubscribes cores under concurrent requests, so OMP_THREAD_LIMIT is
+    set for the subprocess only, leaving PyTorch's pool in this process alone.
+    """
+    command = [pytesseract.pytesseract.tesseract_cmd, source, "stdout", *_tesseract_config(psm, whitelist).split()]
+    env = {**os.environ, "OMP_THREAD_LIMIT": "1"}
+    completed = subprocess.run(command, input=stdin, capture_output=True, env=env)
+    if completed.returncode != 0:
+        raise pytesseract.TesseractError(completed.returncode, completed.stderr.decode(errors="replace"))
+    return completed.stdout.decode("utf-8", errors="replace")
+
+
+def _tesseract_config(psm: int, whitelist: str | None) -> str:
+    """Command-line configuration for the tesseract binary."""
+    config = f"--oem 3 --psm {psm}"
+    if whitelist:
+        config += f" -c tessedit_char_whitelist={whitelist}"
+    return config
+
+
+def ocr_executor() -> ThreadPoolExecutor:
+    """
+    Get the process-wide thread pool OCR calls are dispatched to.
+
+    The pool is created on first use and again after a fork, since worker
+    threads do not survive into a child process.
+
+    Returns:
+        Thread pool with OCR_WORKERS threads.
+    """
+    global _ocr_pool, _ocr_pool_pid
+    if _ocr_pool_pid != os.getpid():
+        with _ocr_pool_lock:
+            if _ocr_pool_pid != os.getpid():
+                _ocr_pool = ThreadPoolExecutor(max_workers=max(1, OCR_WORKERS), thread_name_prefix="ocr")
+                _ocr_pool_pid = os.getpid()
+    return _ocr_pool
+
+
+def decode_image(data: bytes) -> np.ndarray | None:
+    """
+    Decode encoded image bytes (PNG/JPEG) into a BGR image without touching disk.
+
+    Args:
+        data: Raw encoded image bytes, e.g. an uploaded file's contents.
+
+    Returns:
+        BGR image as a NumPy array, or None if the bytes are not a decodable image.
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    decoder = _jpeg_decoder()
+    # OpenCV applies EXIF orientation and libjpeg-turbo does not, so only plain JPEGs take the fast path
+    if decoder is not None and data[:3] == b"\xff\xd8\xff" and b"Exif\x00\x00" not in data[:65536]:
+        try:
+            return decoder.decode(data, pixel_format=TJPF_BGR)
+        except OSError:
+            pass  # e.g. a truncated file that OpenCV may still partly decode
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+@functools.lru_cache(maxsize=1)
+def _jpeg_decoder():
+    """Shared libjpeg-turbo decoder, or None if PyTurboJPEG or its library is missing."""
+    if TurboJPEG is None:
+        return None
+    try:
+        return TurboJPEG()
+    except (OSError, RuntimeError):
+        return None
+
+
+def load_image(path: str) -> np.ndarray | None:
+    """
+    Read an image file as BGR, reusing the decoded array while the file is unchanged.
+
+    The returned array is shared between callers and must not be modified in place.
+
+    Args:
+        path: Filesystem path of the image.
+
+    Returns:
+        BGR image as a NumPy array, or None if the file is missing or not an image.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return _load_image(path, stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=16)
+def _load_image(path: str, mtime_ns: int, size: int) -> np.ndarray | None:
+    """Decode an image file; the modification time and size key out stale cache entries."""
+    try:
+        with open(path, "rb") as f:
+            image = decode_image(f.read())
+    except OSError:
+        return None
+    if image is not None:
+        image.flags.writeable = False
+    return image
+
+
+def downscale_to_max_side(image: np.ndarray, max_side: int) -> Tuple[np.ndarray, float]:
+    """
+    Shrink an image so its longest side is at most `max_side`, keeping aspect ratio.
+
+    Args:
+        image: Source BGR image as a NumPy array.
+        max_side: Maximum length in pixels of the longer side.
+
+    Returns:
+        Tuple of (image, scale) where scale <= 1.0 maps source coordinates to
+        the returned image; the input is returned unchanged when already small.
+    """
+    height, width = image.shape[:2]
+    scale = min(1.0, max_side / max(height, width))
+    if scale >= 1.0:
+        return image, 1.0
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA), scale
+
 
 def crop_with_padding(image: np.ndarray, bbox: dict, padding: int = 4) -> np.ndarray:
     """
@@ -23,7 +241,8 @@ def crop_with_padding(image: np.ndarray, bbox: dict, padding: int = 4) -> np.nda
         padding: Extra pixels around the bbox to include.
 
     Returns:
-        Cropped BGR image as a NumPy array.
+        Cropped BGR image as a view into `image` (no pixels are copied); it
+        must not be written to. The OCR preprocessing reads it as is.
     """
     x1, y1, x2, y2 = map(int, [bbox["x1"], bbox["y1"], bbox["x2"], bbox["y2"]])
     height, width = image.shape[:2]
@@ -36,7 +255,30 @@ def crop_with_padding(image: np.ndarray, bbox: dict, padding: int = 4) -> np.nda
     return image[y1:y2, x1:x2]
 
 
-def to_binary(image_bgr: np.ndarray, width: int = 500) -> np.ndarray:
+def crop_batch(image: np.ndarray, bboxes: np.ndarray, padding: int = 4) -> List[np.ndarray]:
+    """
+    Crop several regions from an image with optional padding.
+
+    Same result as crop_with_padding per box, with the padding and clipping
+    done for all boxes in one NumPy pass.
+
+    Args:
+        image: Source BGR image as a NumPy array.
+        bboxes: (N, 4) array of x1, y1, x2, y2 per box (floats or ints).
+        padding: Extra pixels around each bbox to include.
+
+    Returns:
+        One cropped view into `image` per box, in input order.
+    """
+    height, width = image.shape[:2]
+    corners = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4).astype(np.intp)
+    corners[:, :2] -= padding
+    corners[:, 2:] += padding
+    np.clip(corners, 0, (width, height, width, height), out=corners)
+    return [image[y1:y2, x1:x2] for x1, y1, x2, y2 in corners.tolist()]
+
+
+def to_binary(image_bgr: np.ndarray, width: int = 500, max_height: int = OCR_MAX_HEIGHT) -> np.ndarray:
     """
     Convert a BGR image to a high-contrast binary image suitable for OCR.
 
@@ -45,14 +287,30 @@ def to_binary(image_bgr: np.ndarray, width: int = 500) -> np.ndarray:
     Args:
         image_bgr: BGR image to process.
         width: Target width used for resizing prior to thresholding.
+        max_height: Resize to this height instead if `width` would exceed it (0 for no cap).
 
     Returns:
         Single-channel binary image (uint8) with foreground as white (255).
     """
+    resized = _gray_for_ocr(image_bgr, width, max_height)
+    cv2.threshold(resized, 175, 255, cv2.THRESH_BINARY_INV, dst=resized)
+    return resized
+
+
+def _gray_for_ocr(image_bgr: np.ndarray, width: int, max_height: int) -> np.ndarray:
+    """Grayscale and resize a crop for OCR; the result is a fresh array callers may modify."""
     gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
-    resized = imutils.resize(gray, width=width)
-    _, binary_inv = cv2.threshold(resized, 175, 255, cv2.THRESH_BINARY_INV)
-    return binary_inv
+    height, crop_width = gray.shape[:2]
+    if max_height and height * width > max_height * crop_width:
+        # Tesseract's work scales with pixel count, and overly tall glyphs do not read better
+        size = (max(1, int(crop_width * max_height / height)), max_height)
+    else:
+        # Floored like imutils.resize, so crops keep the size they always had
+        size = (width, max(1, int(height * width / crop_width)))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+
+_DIGIT_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
 
 
 def enhance_for_digits(binary_image: np.ndarray) -> np.ndarray:
@@ -65,16 +323,102 @@ def enhance_for_digits(binary_image: np.ndarray) -> np.ndarray:
     Returns:
         Enhanced single-channel image optimized for digit OCR.
     """
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-    morph = cv2.morphologyEx(binary_image, cv2.MORPH_CLOSE, kernel)
-    inverted = cv2.bitwise_not(morph)
-    blurred = cv2.GaussianBlur(inverted, (5, 5), 0)
-    return blurred
+    morph = cv2.morphologyEx(binary_image, cv2.MORPH_CLOSE, _DIGIT_KERNEL)
+    cv2.bitwise_not(morph, dst=morph)
+    cv2.GaussianBlur(morph, (5, 5), 0, dst=morph)
+    return morph
+
+
+def binary_for_digits(image_bgr: np.ndarray, width: int = 500, max_height: int = OCR_MAX_HEIGHT) -> np.ndarray:
+    """
+    Preprocess a BGR image for digit OCR; same pixels as enhance_for_digits(to_binary(image)).
+
+    Closing the inverted binary and inverting back equals opening the
+    non-inverted binary (the kernel is symmetric), so the threshold skips
+    the inversion and every step writes into the one resized buffer.
+
+    Args:
+        image_bgr: BGR image to process.
+        width: Target width used for resizing prior to thresholding.
+        max_height: Resize to this height instead if `width` would exceed it (0 for no cap).
+
+    Returns:
+        Enhanced single-channel image optimized for digit OCR.
+    """
+    buffer = _gray_for_ocr(image_bgr, width, max_height)
+    cv2.threshold(buffer, 175, 255, cv2.THRESH_BINARY, dst=buffer)
+    cv2.morphologyEx(buffer, cv2.MORPH_OPEN, _DIGIT_KERNEL, dst=buffer)
+    cv2.GaussianBlur(buffer, (5, 5), 0, dst=buffer)
+    return buffer
+
+
+def image_digest(image: np.ndarray) -> bytes:
+    """
+    Compute a content hash of an image region.
+
+    Args:
+        image: Image region as a NumPy array.
+
+    Returns:
+        16-byte BLAKE2b digest covering the region's shape and pixel data.
+    """
+    hasher = hashlib.blake2b(repr(image.shape).encode(), digest_size=16)
+    hasher.update(np.ascontiguousarray(image).data)
+    return hasher.digest()
+
+
+def _cache_get(key: tuple | None) -> str | None:
+    """Look up a memoized OCR result, or None on a miss (or with the cache disabled)."""
+    if key is None:
+        return None
+    with _ocr_cache_lock:
+        if key in _ocr_cache:
+            _ocr_cache.move_to_end(key)
+            return _ocr_cache[key]
+    return None
+
+
+def _cache_put(key: tuple | None, result: str) -> None:
+    """Memoize an OCR result, evicting the least recently used entry when full."""
+    if key is None:
+        return
+    with _ocr_cache_lock:
+        _ocr_cache[key] = result
+        if len(_ocr_cache) > OCR_CACHE_SIZE:
+            _ocr_cache.popitem(last=False)
+
+
+def _cache_key(kind: str, image: np.ndarray, rotate_clockwise: bool) -> tuple | None:
+    """OCR cache key of a region: mode, rotation and pixel digest (None with the cache disabled)."""
+    if OCR_CACHE_SIZE <= 0:
+        return None
+    return (kind, rotate_clockwise, image_digest(image))
+
+
+def _cached_ocr(kind: str, image: np.ndarray, rotate_clockwise: bool, run: Callable[[], str]) -> str:
+    """
+    Return a memoized OCR result for identical pixels, running Tesseract on a miss.
+
+    Args:
+        kind: OCR mode name, part of the cache key.
+        image: Input region the result depends on.
+        rotate_clockwise: Rotation flag, part of the cache key.
+        run: Callable performing the actual OCR.
+
+    Returns:
+        The OCR result string.
+    """
+    key = _cache_key(kind, image, rotate_clockwise)
+    result = _cache_get(key)
+    if result is None:
+        result = run()
+        _cache_put(key, result)
+    return result
 
 
 def ocr_text(image: np.ndarray, rotate_clockwise: bool = False) -> str:
     """
-    Run OCR for general text from an image region.
+    Run OCR for general text from an image region, memoized by crop content.
 
     Args:
         image: Input BGR image region.
@@ -83,16 +427,12 @@ def ocr_text(image: np.ndarray, rotate_clockwise: bool = False) -> str:
     Returns:
         Extracted text with whitespace trimmed.
     """
-    if rotate_clockwise:
-        image = cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
-    binary = to_binary(image)
-    config = r"--oem 3 --psm 6"
-    return pytesseract.image_to_string(binary, config=config).strip()
+    return _cached_ocr("text", image, rotate_clockwise, lambda: _ocr_text(image, rotate_clockwise))
 
 
 def ocr_number(image: np.ndarray, rotate_clockwise: bool = False) -> str:
     """
-    Run OCR targeting numeric values from an image region.
+    Run OCR targeting numeric values from an image region, memoized by crop content.
 
     Args:
         image: Input BGR image region.
@@ -101,13 +441,133 @@ def ocr_number(image: np.ndarray, rotate_clockwise: bool = False) -> str:
     Returns:
         First number found (string) or empty string if none detected.
     """
+    return _cached_ocr("number", image, rotate_clockwise, lambda: _ocr_number(image, rotate_clockwise))
+
+
+def ocr_many(regions: List[Tuple[np.ndarray, str, bool]]) -> List[str]:
+    """
+    OCR several image regions at once, memoized by crop content.
+
+    Cache misses are preprocessed and dispatched to the shared OCR pool. With
+    in-process Tesseract (tesserocr) each region is its own task; with the
+    pytesseract fallback, regions sharing a Tesseract configuration go through
+    one tesseract process (see OCR_BATCH), so the language data is loaded once
+    per configuration instead of once per region.
+
+    Args:
+        regions: (BGR region, "text" or "number", rotate_clockwise) per region.
+
+    Returns:
+        OCR result per region, in input order, as ocr_text/ocr_number return them.
+    """
+    results: List[str | None] = [None] * len(regions)
+    keys = [_cache_key(kind, image, rotate) for image, kind, rotate in regions]
+    misses = []
+    for i, key in enumerate(keys):
+        results[i] = _cache_get(key)
+        if results[i] is None:
+            misses.append(i)
+
+    prepared = {i: _OCR_KINDS[regions[i][1]][0](regions[i][0], regions[i][2]) for i in misses}
+    pool = ocr_executor()
+    if OCR_BATCH and tesserocr is None:
+        groups: Dict[Tuple[int, str | None], List[int]] = {}
+        for i in misses:
+            groups.setdefault(prepared[i][1:], []).append(i)
+        jobs = [
+            (indices, pool.submit(_tesseract_batch, [prepared[i][0] for i in indices], psm, whitelist))
+            for (psm, whitelist), indices in groups.items()
+        ]
+        texts = {i: text for indices, job in jobs for i, text in zip(indices, job.result())}
+    else:
+        jobs = {i: pool.submit(image_to_string, *prepared[i]) for i in misses}
+        texts = {i: job.result() for i, job in jobs.items()}
+
+    for i in misses:
+        results[i] = _OCR_KINDS[regions[i][1]][1](texts[i])
+        _cache_put(keys[i], results[i])
+    return results
+
+
+def _tesseract_batch(images: List[np.ndarray], psm: int, whitelist: str | None) -> List[str]:
+    """
+    Run one tesseract process over several images through a list file.
+
+    Tesseract reads every image named in a .txt list and separates the
+    per-image output with form feeds. If the page count does not match,
+    the images are recognized one by one instead.
+    """
+    if len(images) == 1:
+        return [image_to_string(images[0], psm, whitelist)]
+    with tempfile.TemporaryDirectory(prefix="ocr-") as tmp:
+        paths = []
+        for n, image in enumerate(images):
+            path = os.path.join(tmp, f"{n}.pgm")
+            cv2.imwrite(path, image)
+            paths.append(path)
+        listing = os.path.join(tmp, "list.txt")
+        with open(listing, "w") as f:
+            f.write("\n".join(paths) + "\n")
+        text = _run_tesseract(listing, psm, whitelist)
+    pages = text.split("\f")
+    if len(pages) < len(images):
+        return [image_to_string(image, psm, whitelist) for image in images]
+    return pages[:len(images)]
+
+
+def _prepare_text(image: np.ndarray, rotate_clockwise: bool = False) -> Tuple[np.ndarray, int, str | None]:
+    """Preprocess a region for general text OCR: (pixels, psm, whitelist)."""
+    if rotate_clockwise:
+        image = cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    return to_binary(image), 6, None
+
+
+def _prepare_number(image: np.ndarray, rotate_clockwise: bool = False) -> Tuple[np.ndarray, int, str | None]:
+    """Preprocess a region for numeric OCR: (pixels, psm, whitelist)."""
     if rotate_clockwise:
         image = cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
-    binary = to_binary(image)
-    enhanced = enhance_for_digits(binary)
-    config = r"--oem 3 --psm 13 -c tessedit_char_whitelist=0123456789."
-    text = pytesseract.image_to_string(enhanced, config=config)
-
-    import re
-    numbers = re.findall(r"\d+\.\d+|\d+", text)
-    return numbers[0] if numbers else "" 
\ No newline at end of file
+    return binary_for_digits(image), 13, "0123456789."
+
+
+_NUMBER = re.compile(r"\d+\.\d+|\d+")
+
+
+def _first_number(text: str) -> str:
+    """First number in OCR output, or an empty string."""
+    match = _NUMBER.search(text)
+    return match.group() if match else ""
+
+
+# OCR mode -> (preprocess region, postprocess Tesseract output)
+_OCR_KINDS = {
+    "text": (_prepare_text, str.strip),
+    "number": (_prepare_number, _first_number),
+}
+
+
+def _ocr_text(image: np.ndarray, rotate_clockwise: bool = False) -> str:
+    """
+    Run OCR for general text from an image region.
+
+    Args:
+        image: Input BGR image region.
+        rotate_clockwise: Whether to rotate 90 degrees clockwise prior to OCR.
+
+    Returns:
+        Extracted text with whitespace trimmed.
+    """
+    return image_to_string(*_prepare_text(image, rotate_clockwise)).strip()
+
+
+def _ocr_number(image: np.ndarray, rotate_clockwise: bool = False) -> str:
+    """
+    Run OCR targeting numeric values from an image region.
+
+    Args:
+        image: Input BGR image region.
+        rotate_clockwise: Whether to rotate 90 degrees clockwise prior to OCR.
+
+    Returns:
+        First number found (string) or empty string if none detected.
+    """
+    return _first_number(image_to_string(*_prepare_number(image, rotate_clockwise)))
\ No newline at end of file
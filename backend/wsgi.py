@@ -3,6 +3,7 @@
 import logging
 import sys
 
+import config  # noqa: F401  (caps native thread pools before numpy/cv2 load)
 from app import create_app
 from model_manager import model_manager
 
@@ -16,3 +17,7 @@ if not model_manager.is_ready():
         "BarGraphAnalyzer not ready — API will return errors until fixed. %s",
         model_manager.init_error or "unknown",
     )
+else:
+    # With preload_app (CPU only) this runs once in the master, otherwise in
+    # each worker; keepalive threads are started per worker from post_fork
+    model_manager.warmup()
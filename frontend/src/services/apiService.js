@@ -7,6 +7,20 @@
 
 const API_BASE = '/api';
 
+// Analysis session returned by /bar_analyzer; sent with every follow-up request
+// so the backend edits this upload's detections rather than another user's.
+let sessionId = null;
+
+/**
+ * Add the current analysis session header to a set of request headers
+ *
+ * @param {Object} headers - Base request headers
+ * @returns {Object} Headers including X-Session-Id when a session exists
+ */
+const sessionHeaders = (headers = {}) => (
+    sessionId ? { ...headers, 'X-Session-Id': sessionId } : headers
+);
+
 /**
  * Upload an image file for bar graph analysis
  * 
@@ -33,7 +47,9 @@ export const uploadImageForAnalysis = async (file) => {
             throw new Error(errorText || `HTTP ${response.status}: ${response.statusText}`);
         }
 
-        return await response.json();
+        const data = await response.json();
+        sessionId = data.session_id || null;
+        return data;
     } catch (error) {
         if (error.name === 'TypeError' && error.message.includes('fetch')) {
             throw new Error('Network error: Unable to reach the backend server');
@@ -55,9 +71,9 @@ export const updateValues = async ({ origin_value, ymax_value }) => {
     try {
         const response = await fetch(`${API_BASE}/update_values`, {
             method: 'POST',
-            headers: {
+            headers: sessionHeaders({
                 'Content-Type': 'application/json',
-            },
+            }),
             body: JSON.stringify({ origin_value, ymax_value }),
         });
 
@@ -98,9 +114,9 @@ export const updateBoxCoordinates = async (boxId, coords) => {
 
         const response = await fetch('/api/update_box_coordinates', {
             method: 'POST',
-            headers: {
+            headers: sessionHeaders({
                 'Content-Type': 'application/json',
-            },
+            }),
             body: JSON.stringify(requestBody),
         });
 
@@ -126,9 +142,9 @@ export const calculateHeights = async () => {
     try {
         const response = await fetch('/api/calculate_heights', {
             method: 'POST',
-            headers: {
+            headers: sessionHeaders({
                 'Content-Type': 'application/json',
-            },
+            }),
         });
 
         if (!response.ok) {
@@ -197,9 +213,9 @@ export const updateBarNames = async (barNames) => {
     try {
         const response = await fetch('/api/update_bar_names', {
             method: 'POST',
-            headers: {
+            headers: sessionHeaders({
                 'Content-Type': 'application/json',
-            },
+            }),
             body: JSON.stringify({ bar_names: barNames }),
         });
 
@@ -229,9 +245,9 @@ export const updateBoxCategory = async (boxId, newCategory) => {
     try {
         const response = await fetch('/api/update_box_category', {
             method: 'POST',
-            headers: {
+            headers: sessionHeaders({
                 'Content-Type': 'application/json',
-            },
+            }),
             body: JSON.stringify({
                 box_id: boxId,
                 new_category: newCategory
@@ -266,9 +282,9 @@ export const addNewBox = async (boxData) => {
     try {
         const response = await fetch('/api/add_new_box', {
             method: 'POST',
-            headers: {
+            headers: sessionHeaders({
                 'Content-Type': 'application/json',
-            },
+            }),
             body: JSON.stringify(boxData),
         });
 
@@ -295,9 +311,9 @@ export const removeBox = async (boxId) => {
     try {
         const response = await fetch('/api/remove_box', {
             method: 'POST',
-            headers: {
+            headers: sessionHeaders({
                 'Content-Type': 'application/json',
-            },
+            }),
             body: JSON.stringify({ box_id: boxId }),
         });
 
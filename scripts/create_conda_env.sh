@@ -30,7 +30,8 @@ Next steps:
    backend/models/best.pt
 
 3) Run backend:
-   python backend/app.py
+   python backend/app.py                                   # development server
+   cd backend && gunicorn -c gunicorn.conf.py wsgi:application   # production (pip install gunicorn)
 
 4) Run frontend:
    cd frontend && npm install && npm run dev